@@ -1,6 +1,5 @@
 
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
@@ -156,25 +155,73 @@ def login_gate(prefix: str = "gate"):
     return st.session_state.get("paid_unlocked", False)
 
 # ---- Helpers ----
-DEFAULT_BRACKETS = [(0,0.05),(540000,0.12),(1210000,0.20),(2420000,0.30),(4530000,0.40)]
-def indiv_div_tax(dividend, mode, other_income, brackets):
-    if mode=="split28":
-        return 0.28*dividend
-    # integrate: rough progressive model with 8.5% credit cap logic simplified
-    taxable = other_income + dividend
-    tax = 0.0
-    last = 0
-    for th, rate in brackets:
-        if taxable>th:
-            tax = (taxable-th)*rate; last=rate
-    credit = min(dividend*0.085, 80000.0)
-    return max(0.0, tax - credit)
-
-def _fmt_money(x):
+from dividend_tax import build_company_tax_figure, build_shareholder_tax_figure
+from presentation import dividend_view, show_table
+
+# ---- Prewarm (cache warming + usage stats) ----
+# 設定於 Streamlit Secrets：
+# [prewarm]
+# enabled = true                     # 預設啟用
+# usage_log = "usage_stats.jsonl"    # 記錄實際輸入組合；預熱時取最常用前 top_n 組
+# top_n = 10
+# estate_profiles / dividend_profiles 可直接指定清單（優先於使用統計）
+import prewarm as _prewarm
+
+def _prewarm_config():
+    try:
+        return dict(st.secrets.get("prewarm", {}))
+    except Exception:
+        return {}
+
+@st.cache_resource(show_spinner=False)
+def _load_estate_mod():
+    import importlib.util as _ilu
+    mod_path = str(_Path(__file__).with_name("estate_tax_app.py"))
+    spec = _ilu.spec_from_file_location("estate_mod", mod_path)
+    mod = _ilu.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+@st.cache_resource(show_spinner=False)
+def _start_prewarm():
+    # 每個程序只啟動一次（Streamlit 無伺服器啟動掛鉤，於首次執行腳本時觸發，背景進行）
+    return _prewarm.start_prewarm(_load_estate_mod(), _prewarm_config())
+
+@st.cache_resource(show_spinner=False)
+def _scenario_store():
+    # 方案儲存位置可於 Secrets 設定：[scenario_store] path = "..."
+    from scenario_store import ScenarioStore
     try:
-        return f"{float(x):,.0f}"
+        path = st.secrets.get("scenario_store", {}).get("path")
     except Exception:
-        return x
+        path = None
+    return ScenarioStore(path or str(_Path(__file__).with_name("saved_scenarios")))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _run_pipeline(company, family, initial_estate, years, premium, claim_ratio, pretax_growth, ownership):
+    from pipeline import run_pipeline
+    mod = _load_estate_mod()
+    sim = mod.EstateTaxSimulator(mod.EstateTaxCalculator(mod.TaxConstants()))
+    return run_pipeline(company, family, initial_estate,
+                        cash_pcts=np.linspace(0.0, 1.0, 21), stock_pcts=(0.0, 0.1, 0.2),
+                        years=years, annual_gifts=(0, 122, 244), premiums=(premium,),
+                        claim_ratio=claim_ratio, pretax_growth=pretax_growth, ownership=ownership,
+                        simulator=sim)
+
+def _record_usage(kind, profile):
+    path = _prewarm_config().get("usage_log")
+    if not path:
+        return
+    key = f"_usage_last_{kind}"
+    if st.session_state.get(key) == profile:
+        return
+    st.session_state[key] = profile
+    try:
+        _prewarm.record_usage(path, kind, profile)
+    except Exception as _e:
+        print("Usage log error:", _e)
+
+_start_prewarm()
 
 # ---- UI ----
 try:
@@ -190,7 +237,7 @@ with c2:
     st.title("《影響力》傳承策略平台｜永傳家族辦公室")
 render_user_info_bar()
 
-tab1, tab3 = st.tabs(["模組一｜單年度稅負試算", "模組三｜AI 秒算遺產稅"])
+tab1, tab3, tab_pipe = st.tabs(["模組一｜單年度稅負試算", "模組三｜AI 秒算遺產稅", "整合試算｜股利 → 遺產"])
 
 with tab1:
     st.subheader("單年度稅負試算（公司層 × 股東層）")
@@ -227,93 +274,41 @@ with tab1:
             withhold = st.number_input("非居民股利扣繳率（條約）", 0.0, 0.30, 0.21, 0.01)
 
     # ---- 計算 ----
-    corp_tax = max(pretax*corp_tax_rate, pretax*corp_amt_min)
-    after_tax = max(0.0, pretax - corp_tax)
-    to_legal = 0.0
-    legal_reserve = 0.0
-    if legal_on:
-        target = init_capital * lr_cap
-        room = max(0.0, target - legal_reserve)
-        to_legal = min(after_tax * lr_rate, room)
-    dist_base = max(0.0, after_tax - to_legal)
-    cash = dist_base * cash_pct
-    stock = dist_base * stock_pct
-    keep = max(0.0, dist_base - cash - stock)
-    undist_tax = keep * undist_rate
-    if shareholder_kind=="corporate_resident":
-        sh_tax = 0.0
-    elif shareholder_kind=="individual_resident":
-        sh_tax = indiv_div_tax(cash+stock, indiv_mode, other_income, DEFAULT_BRACKETS)
-    else:
-        sh_tax = (cash+stock) * withhold
-
-    company_tax_total = corp_tax + undist_tax
-    total_all = company_tax_total + sh_tax
+    dividend_inputs = dict(pretax=pretax, init_capital=init_capital, corp_tax_rate=corp_tax_rate,
+                           corp_amt_min=corp_amt_min, legal_on=legal_on, lr_rate=lr_rate, lr_cap=lr_cap,
+                           undist_rate=undist_rate, cash_pct=cash_pct, stock_pct=stock_pct,
+                           shareholder_kind=shareholder_kind, indiv_mode=indiv_mode,
+                           other_income=other_income, withhold=withhold)
+    r, df_company, df_sh, df_total = dividend_view(**dividend_inputs)
+    _record_usage("dividend", dividend_inputs)
 
     # ---- 結果（公司層 / 股東層 / 總結）----
     c1, c2 = st.columns(2)
     with c1:
         st.markdown("#### 🏢 公司層")
-        df_company = pd.DataFrame([
-            {"項目":"稅前盈餘","金額":pretax},
-            {"項目":"公司所得稅 / AMT","金額":corp_tax},
-            {"項目":"稅後盈餘","金額":after_tax},
-            {"項目":"提列法定盈餘公積","金額":to_legal},
-            {"項目":"可分配盈餘","金額":dist_base},
-            {"項目":"保留盈餘（未分配）","金額":keep},
-            {"項目":"未分配盈餘稅","金額":undist_tax},
-            {"項目":"公司層合計稅","金額":company_tax_total},
-        ])
-        df_company["金額"] = df_company["金額"].map(_fmt_money)
-        st.dataframe(df_company, use_container_width=True, hide_index=True)
+        show_table(df_company, money=["金額"])
 
     with c2:
         st.markdown("#### 👤 股東層")
-        df_sh = pd.DataFrame([
-            {"項目":"發放現金股利","金額":cash},
-            {"項目":"發放股票股利","金額":stock},
-            {"項目":"股東層所得稅","金額":sh_tax},
-            {"項目":"股東實領淨額（含股利）","金額":cash+stock-sh_tax},
-        ])
-        df_sh["金額"] = df_sh["金額"].map(_fmt_money)
-        st.dataframe(df_sh, use_container_width=True, hide_index=True)
+        show_table(df_sh, money=["金額"])
 
     st.markdown("#### 總結")
-    df_total = pd.DataFrame([{
-        "公司層合計稅": company_tax_total,
-        "股東層稅": sh_tax,
-        "本年總稅負": total_all,
-        "有效稅率(總稅/稅前盈餘)": (total_all/pretax) if pretax else 0.0
-    }])
-    for col in df_total.columns:
-        df_total[col] = df_total[col].map(lambda v: f"{v:,.0f}" if isinstance(v,(int,float)) and not str(col).startswith("有效稅率") else (f"{v:.2%}" if str(col).startswith("有效稅率") else v))
-    st.dataframe(df_total, use_container_width=True)
+    show_table(df_total, money=["公司層合計稅", "股東層稅", "本年總稅負"], percent=["有效稅率(總稅/稅前盈餘)"],
+               hide_index=False)
 
     # ---- 互動圖（Plotly）----
     g1, g2 = st.columns(2)
     with g1:
-        labels1 = ["公司稅", "未分配盈餘稅"]
-        values1 = [corp_tax, undist_tax]
-        fig1 = go.Figure(data=[go.Bar(x=labels1, y=values1, text=[f"{v:,.0f}" for v in values1], textposition="auto")])
-        fig1.update_layout(title="公司層稅負", yaxis_title="金額（元）", margin=dict(l=10,r=10,t=40,b=10))
-        st.plotly_chart(fig1, use_container_width=True)
+        st.plotly_chart(build_company_tax_figure(r), use_container_width=True)
     with g2:
-        labels2 = ["股東層稅"]
-        values2 = [sh_tax]
-        fig2 = go.Figure(data=[go.Bar(x=labels2, y=values2, text=[f"{v:,.0f}" for v in values2], textposition="auto")])
-        fig2.update_layout(title="股東層稅負", yaxis_title="金額（元）", margin=dict(l=10,r=10,t=40,b=10))
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(build_shareholder_tax_figure(r), use_container_width=True)
 
 with tab3:
     st.subheader("AI秒算遺產稅（原生頁面整合）")
-    import importlib.util as _ilu, sys as _sys
-    mod_path = str(_Path(__file__).with_name("estate_tax_app.py"))
-    spec = _ilu.spec_from_file_location("estate_mod", mod_path)
-    estate_mod = _ilu.module_from_spec(spec)
-    spec.loader.exec_module(estate_mod)
+    estate_mod = _load_estate_mod()
     calc = estate_mod.EstateTaxCalculator(estate_mod.TaxConstants())
     sim = estate_mod.EstateTaxSimulator(calc)
-    ui = estate_mod.EstateTaxUI(calc, sim)
+    ui = estate_mod.EstateTaxUI(calc, sim, usage_recorder=_record_usage, scenario_store=_scenario_store())
     # 傳遞主程式的解鎖狀態給子模組
     paid3 = st.session_state.get('paid_unlocked', False)
     try:
@@ -324,3 +319,58 @@ with tab3:
         st.info('🔒 進階功能（保險／贈與模擬）需登入解鎖。以下為基本遺產稅估算功能；進階功能請使用本頁內置登入框登入。')
     ui.render_ui()
 
+
+
+with tab_pipe:
+    st.subheader("股利 → 遺產整合試算（模組一 × 模組三）")
+    st.caption("沿用模組一的公司參數與股東型別，逐年把創辦人實領股利與公司保留權益累積進遺產，"
+               "套用提前贈與與保險策略，比較各分配政策在不同身故年度的家人總共取得。")
+    # 贈與／保險策略同模組三，需登入解鎖（模組三登入表單或付費帳號）
+    if not (st.session_state.get("authenticated") or st.session_state.get("paid_unlocked")):
+        st.info("🔒 整合試算包含保險／贈與模擬，需登入解鎖；請於「模組三」分頁登入。")
+    else:
+        from pipeline import best_by_horizon, best_by_policy
+        pA, pB, pC = st.columns(3)
+        with pA:
+            pipe_estate = st.number_input("目前個人資產（萬）", 0, 1_000_000, 5000, 100, key="pipe_estate")
+            pipe_years = st.slider("試算年數", 1, 40, 20, key="pipe_years")
+            pipe_growth = st.number_input("稅前盈餘年成長率", -0.5, 0.5, 0.0, 0.01, key="pipe_growth")
+            pipe_ownership = st.number_input("創辦人持股比例", 0.0, 1.0, 1.0, 0.05, key="pipe_ownership")
+        with pB:
+            pipe_spouse = st.checkbox("有配偶", False, key="pipe_spouse")
+            pipe_children = st.number_input("直系血親卑親屬數", 0, 10, 0, key="pipe_children")
+            pipe_parents = st.number_input("父母數", 0, 2, 0, key="pipe_parents")
+            pipe_max_disabled = (1 if pipe_spouse else 0) + pipe_children + pipe_parents
+            pipe_disabled = st.number_input("重度以上身心障礙者數", 0, pipe_max_disabled, 0, key="pipe_disabled")
+            pipe_other = st.number_input("受撫養之兄弟姊妹、祖父母數", 0, 5, 0, key="pipe_other")
+        with pC:
+            pipe_premium = st.number_input("保費（萬，0 表示不規劃保險）", 0, int(pipe_estate), 0, 100, key="pipe_premium")
+            pipe_claim_ratio = st.number_input("理賠金 / 保費", 0.0, 10.0, 1.5, 0.1, key="pipe_claim_ratio")
+
+        company = dict(pretax=pretax, init_capital=init_capital, corp_tax_rate=corp_tax_rate, corp_amt_min=corp_amt_min,
+                       legal_on=legal_on, lr_rate=lr_rate, lr_cap=lr_cap, undist_rate=undist_rate,
+                       shareholder_kind=shareholder_kind, indiv_mode=indiv_mode, other_income=other_income,
+                       withhold=withhold)
+        family = dict(spouse=pipe_spouse, adult_children=pipe_children, parents=pipe_parents,
+                      disabled_people=pipe_disabled, other_dependents=pipe_other)
+        df_pipe = _run_pipeline(company, family, pipe_estate, pipe_years, pipe_premium, pipe_claim_ratio,
+                                pipe_growth, pipe_ownership)
+        df_best = best_by_horizon(df_pipe)
+        st.markdown(f"共比較 **{len(df_pipe):,d}** 種組合（分配政策 × 每年贈與 × 身故年度；保費固定為 {pipe_premium:,d} 萬）")
+        st.caption("假設：公司保留盈餘以帳面值計入遺產、未分配前不課股東層稅，因此低現金股利通常看起來較有利；"
+                   "理賠金於任何身故年度皆全額給付。請以下方各分配政策的比較為主，最佳組合僅供參考。")
+
+        fig_pipe = go.Figure()
+        fig_pipe.add_trace(go.Scatter(x=df_best["年度"], y=df_best["家人總共取得（萬）"], mode="lines+markers", name="最佳組合"))
+        fig_pipe.add_trace(go.Scatter(x=df_best["年度"], y=df_best["沒有規劃_家人總共取得（萬）"], mode="lines", name="同政策、未贈與／未投保"))
+        fig_pipe.update_layout(title="各身故年度的家人總共取得（萬）", xaxis_title="年度", yaxis_title="萬",
+                               margin=dict(l=10,r=10,t=40,b=10))
+        st.plotly_chart(fig_pipe, use_container_width=True)
+
+        pipe_year = st.slider("比較分配政策的身故年度", 1, pipe_years, pipe_years, key="pipe_year") if pipe_years > 1 else 1
+        st.markdown(f"#### 第 {pipe_year} 年身故：各分配政策（取最佳每年贈與）")
+        show_table(best_by_policy(df_pipe, pipe_year)[["現金股利%", "股票股利%", "每年贈與上限（萬）", "累計贈與（萬）",
+                                                      "遺產總額（萬）", "累計稅負（萬）", "遺產稅（萬）", "家人總共取得（萬）",
+                                                      "規劃效益"]],
+                   money=["累計贈與（萬）", "遺產總額（萬）", "累計稅負（萬）", "遺產稅（萬）", "家人總共取得（萬）", "規劃效益"],
+                   percent=["現金股利%", "股票股利%"])
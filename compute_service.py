@@ -0,0 +1,377 @@
+"""本機 JSON 計算服務（供 CRM 等程式呼叫，不經 Streamlit 頁面）
+
+端點（POST，JSON 物件）：
+- /estate/tax       總資產與家庭成員 → 課稅遺產淨額、遺產稅、扣除額（萬）；
+                    人數超過頁面上限（FAMILY_LIMITS、重度身心障礙者 ≤ 配偶＋子女＋父母）時回 400
+- /estate/simulate  另加 premium／claim／gift（可省略，採頁面預設值）→ 各規劃策略比較；
+                    保費 > 總資產或贈與 > 總資產 − 保費時回 400（同頁面限制）
+- /dividend         模組一單年度試算參數（同 compute_single_year）→ 公司層／股東層各項金額（元）
+未列出的欄位（例如打錯字的 "spose"）一律回 400，不會被靜默忽略。
+GET /metrics 回傳各端點延遲百分位數、批次大小與錯誤數。
+
+同時到達的請求會在 max_wait_ms 內收集成一批（至多 max_batch 筆），交由 worker pool 以向量化計算。
+只使用標準函式庫 http.server；壓測：python compute_service.py bench --concurrency 32 --requests 5000
+
+用法：python compute_service.py serve --port 8765 --workers 4 --max-batch 64 --max-wait-ms 2
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+import estate_tax_app
+from dividend_tax import compute_single_year_batch
+
+
+# ===============================
+# 1. 向量化計算（一批請求 → 一批結果）
+# ===============================
+ESTATE_FIELDS = ["total_assets", "spouse", "adult_children", "other_dependents", "disabled_people", "parents"]
+DIVIDEND_FIELDS = ["pretax", "init_capital", "corp_tax_rate", "corp_amt_min", "legal_on", "lr_rate", "lr_cap",
+                   "undist_rate", "cash_pct", "stock_pct", "shareholder_kind"]
+DIVIDEND_DEFAULTS = {"indiv_mode": "split28", "other_income": 0.0, "withhold": 0.0}
+
+_calc = estate_tax_app.EstateTaxCalculator(estate_tax_app.TaxConstants())
+_sim = estate_tax_app.EstateTaxSimulator(_calc)
+
+
+def _columns(payloads: List[Dict[str, Any]], required: List[str], defaults: Dict[str, Any] = None) -> Dict[str, np.ndarray]:
+    defaults = defaults or {}
+    cols = {}
+    for name in required + list(defaults):
+        if name in defaults:
+            cols[name] = np.array([p.get(name, defaults[name]) for p in payloads])
+        else:
+            cols[name] = np.array([p[name] for p in payloads])
+    return cols
+
+
+def _estate_family(payloads):
+    defaults = {k: 0 for k in ESTATE_FIELDS[1:]}
+    defaults["spouse"] = False
+    return _columns(payloads, ["total_assets"], defaults)
+
+
+def batch_estate_tax(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    c = _estate_family(payloads)
+    taxable, tax, deductions = _calc.calculate_estate_tax_batch(*(c[k] for k in ESTATE_FIELDS))
+    return [{"taxable_amount": float(a), "tax_due": float(t), "deductions": float(d)}
+            for a, t, d in zip(taxable, tax, deductions)]
+
+
+def batch_estate_simulate(payloads: List[Dict[str, Any]]) -> List[Any]:
+    c = _estate_family(payloads)
+    family = [c[k] for k in ESTATE_FIELDS]
+    _, tax_due, _ = _calc.calculate_estate_tax_batch(*family)
+    plan = {"premium": [], "claim": [], "gift": []}
+    errors: List[Any] = []
+    for p, a, t in zip(payloads, c["total_assets"], tax_due):
+        try:
+            premium, claim, gift = _sim.resolve_case_inputs(
+                float(a), float(t), p.get("premium"), p.get("claim"), p.get("gift")
+            )
+            errors.append(None)
+        except ValueError as e:
+            premium = claim = gift = 0.0
+            errors.append(e)
+        plan["premium"].append(premium)
+        plan["claim"].append(claim)
+        plan["gift"].append(gift)
+    tax, net = _sim.simulate_case_plans_batch(*family, plan["premium"], plan["claim"], plan["gift"])
+    out = []
+    for i in range(len(payloads)):
+        if errors[i] is not None:
+            out.append(errors[i])  # 不合法的請求單獨回 400，不影響同批其他請求
+            continue
+        out.append({
+            "premium": float(plan["premium"][i]), "claim": float(plan["claim"][i]), "gift": float(plan["gift"][i]),
+            "plans": [{"規劃策略": name, "遺產稅（萬）": int(tax[i, j]), "家人總共取得（萬）": int(net[i, j]),
+                       "規劃效益": int(net[i, j] - net[i, 0])}
+                      for j, name in enumerate(estate_tax_app.CASE_STRATEGIES)]
+        })
+    return out
+
+
+def batch_dividend(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    c = _columns(payloads, DIVIDEND_FIELDS, DIVIDEND_DEFAULTS)
+    r = compute_single_year_batch(**c)
+    return [{k: float(v[i]) for k, v in r.items()} for i in range(len(payloads))]
+
+
+ENDPOINTS: Dict[str, Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = {
+    "/estate/tax": batch_estate_tax,
+    "/estate/simulate": batch_estate_simulate,
+    "/dividend": batch_dividend,
+}
+
+
+# ---- 單筆請求檢查（送進批次前，不合法時回 400）----
+def _check_fields(payload: Dict[str, Any], allowed: List[str], required: List[str]) -> None:
+    unknown = sorted(set(payload) - set(allowed))
+    if unknown:
+        raise ValueError(f"未知欄位：{', '.join(unknown)}")
+    missing = [k for k in required if k not in payload]
+    if missing:
+        raise ValueError(f"缺少欄位：{', '.join(missing)}")
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _check_estate(payload: Dict[str, Any], extra: List[str] = ()) -> None:
+    _check_fields(payload, ESTATE_FIELDS + list(extra), ["total_assets"])
+    if not _is_number(payload["total_assets"]) or payload["total_assets"] < 0:
+        raise ValueError("total_assets 須為非負數")
+    if not isinstance(payload.get("spouse", False), bool):
+        raise ValueError("spouse 須為 true／false")
+    counts = {k: payload.get(k, 0) for k in ESTATE_FIELDS[2:]}
+    for k, v in counts.items():
+        if not isinstance(v, int) or isinstance(v, bool):
+            raise ValueError(f"{k} 須為整數")
+    for k in extra:
+        if k in payload and not _is_number(payload[k]):
+            raise ValueError(f"{k} 須為數字")
+    _calc.check_family(payload.get("spouse", False), counts["adult_children"], counts["other_dependents"],
+                       counts["disabled_people"], counts["parents"])
+
+
+VALIDATORS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    "/estate/tax": _check_estate,
+    "/estate/simulate": lambda p: _check_estate(p, ["premium", "claim", "gift"]),
+    "/dividend": lambda p: _check_fields(p, DIVIDEND_FIELDS + list(DIVIDEND_DEFAULTS), DIVIDEND_FIELDS),
+}
+
+
+# ===============================
+# 2. 微批次與延遲統計
+# ===============================
+class LatencyStats:
+    """單一端點的延遲（保留最近 window 筆）、批次大小與錯誤數"""
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool = True):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.count += 1
+            if not ok:
+                self.errors += 1
+
+    def add_batch(self, size: int):
+        with self._lock:
+            self.batch_sizes.append(size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = np.array(self.latencies) * 1000
+            sizes = np.array(self.batch_sizes)
+            count, errors = self.count, self.errors
+        snap = {"count": count, "errors": errors, "batches": int(sizes.size),
+                "mean_batch_size": float(sizes.mean()) if sizes.size else 0.0}
+        if lat.size:
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            snap.update({"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(lat.max())})
+        return snap
+
+
+class MicroBatcher:
+    """收集同一端點的並行請求，湊成一批後送進 worker pool 計算"""
+
+    def __init__(self, fn: Callable, pool: ThreadPoolExecutor, stats: LatencyStats,
+                 max_batch: int = 64, max_wait_ms: float = 2.0):
+        self.fn = fn
+        self.pool = pool
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        fut: Future = Future()
+        self._queue.put((payload, fut))
+        return fut
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remain = deadline - time.perf_counter()
+                if remain <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remain))
+                except queue.Empty:
+                    break
+            self.pool.submit(self._run, batch)
+
+    def _run(self, batch):
+        self.stats.add_batch(len(batch))
+        try:
+            results = self.fn([p for p, _ in batch])
+        except Exception:
+            # 整批失敗時逐筆重算，避免一筆錯誤輸入拖累同批其他請求
+            for p, fut in batch:
+                try:
+                    res = self.fn([p])[0]
+                except Exception as e:
+                    fut.set_exception(e)
+                    continue
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+            return
+        for (_, fut), res in zip(batch, results):
+            # 批次函式可對個別請求回傳例外（例如輸入不合法），只讓該請求失敗
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+
+# ===============================
+# 3. HTTP 伺服器
+# ===============================
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # 預設 5，並行連線一多就會被 reset
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, workers: int = 4,
+                max_batch: int = 64, max_wait_ms: float = 2.0) -> ThreadingHTTPServer:
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compute")
+    stats = {path: LatencyStats() for path in ENDPOINTS}
+    batchers = {path: MicroBatcher(fn, pool, stats[path], max_batch, max_wait_ms) for path, fn in ENDPOINTS.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # keep-alive 下標頭與本文分兩次寫出，Nagle 會等對方 delayed ACK，每個回應多約 40ms
+        disable_nagle_algorithm = True
+
+        def _send(self, code: int, body: Any):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, {path: s.snapshot() for path, s in stats.items()})
+            elif self.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            batcher = batchers.get(self.path)
+            if batcher is None:
+                self._send(404, {"error": "not found"})
+                return
+            t0 = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("request body must be a JSON object")
+                VALIDATORS[self.path](payload)
+                result = batcher.submit(payload).result()
+            except (ValueError, KeyError, TypeError) as e:
+                stats[self.path].add(time.perf_counter() - t0, ok=False)
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+                return
+            except Exception as e:
+                stats[self.path].add(time.perf_counter() - t0, ok=False)
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            stats[self.path].add(time.perf_counter() - t0)
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return _Server((host, port), Handler)
+
+
+# ===============================
+# 4. 本機壓測
+# ===============================
+def run_bench(url: str, concurrency: int, requests: int, path: str = "/estate/simulate") -> Dict[str, Any]:
+    """以多執行緒對服務送出請求，回傳吞吐量與客戶端延遲百分位數"""
+    import http.client
+    from urllib.parse import urlparse
+
+    u = urlparse(url)
+    rng = np.random.default_rng(0)
+    bodies = [json.dumps({"total_assets": int(a), "spouse": bool(s), "adult_children": int(c)}).encode()
+              for a, s, c in zip(rng.integers(1000, 100000, requests), rng.integers(0, 2, requests),
+                                 rng.integers(0, 5, requests))]
+    latencies: List[float] = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        conn = http.client.HTTPConnection(u.hostname, u.port or 80)
+        local = []
+        for i in counter:
+            t0 = time.perf_counter()
+            conn.request("POST", path, bodies[i], {"Content-Type": "application/json"})
+            conn.getresponse().read()
+            local.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {"requests": len(latencies), "seconds": elapsed, "rps": len(latencies) / elapsed,
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="本機 JSON 計算服務")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve")
+    sp.add_argument("--host", default="127.0.0.1")
+    sp.add_argument("--port", type=int, default=8765)
+    sp.add_argument("--workers", type=int, default=4)
+    sp.add_argument("--max-batch", type=int, default=64)
+    sp.add_argument("--max-wait-ms", type=float, default=2.0)
+    bp = sub.add_parser("bench")
+    bp.add_argument("--url", default="http://127.0.0.1:8765")
+    bp.add_argument("--path", default="/estate/simulate")
+    bp.add_argument("--concurrency", type=int, default=32)
+    bp.add_argument("--requests", type=int, default=5000)
+    args = ap.parse_args()
+    if args.cmd == "serve":
+        server = make_server(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms)
+        print(f"Serving on http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        print(json.dumps(run_bench(args.url, args.concurrency, args.requests, args.path), indent=2))
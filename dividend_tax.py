@@ -0,0 +1,187 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# ===============================
+# 1. 常數
+# ===============================
+DEFAULT_BRACKETS: List[Tuple[float, float]] = [(0,0.05),(540000,0.12),(1210000,0.20),(2420000,0.30),(4530000,0.40)]
+
+
+# ===============================
+# 2. 稅務計算邏輯（模組一：單年度）
+# ===============================
+def indiv_div_tax(dividend, mode, other_income, brackets):
+    if mode=="split28":
+        return 0.28*dividend
+    # integrate: rough progressive model with 8.5% credit cap logic simplified
+    taxable = other_income + dividend
+    tax = 0.0
+    last = 0
+    for th, rate in brackets:
+        if taxable>th:
+            tax = (taxable-th)*rate; last=rate
+    credit = min(dividend*0.085, 80000.0)
+    return max(0.0, tax - credit)
+
+
+def compute_single_year(pretax: float, init_capital: float, corp_tax_rate: float, corp_amt_min: float,
+                        legal_on: bool, lr_rate: float, lr_cap: float, undist_rate: float,
+                        cash_pct: float, stock_pct: float, shareholder_kind: str,
+                        indiv_mode: str = "split28", other_income: float = 0.0, withhold: float = 0.0,
+                        brackets: List[Tuple[float, float]] = DEFAULT_BRACKETS) -> Dict[str, float]:
+    """單年度稅負試算（公司層 × 股東層），回傳各項金額（元）"""
+    corp_tax = max(pretax*corp_tax_rate, pretax*corp_amt_min)
+    after_tax = max(0.0, pretax - corp_tax)
+    to_legal = 0.0
+    legal_reserve = 0.0
+    if legal_on:
+        target = init_capital * lr_cap
+        room = max(0.0, target - legal_reserve)
+        to_legal = min(after_tax * lr_rate, room)
+    dist_base = max(0.0, after_tax - to_legal)
+    cash = dist_base * cash_pct
+    stock = dist_base * stock_pct
+    keep = max(0.0, dist_base - cash - stock)
+    undist_tax = keep * undist_rate
+    if shareholder_kind=="corporate_resident":
+        sh_tax = 0.0
+    elif shareholder_kind=="individual_resident":
+        sh_tax = indiv_div_tax(cash+stock, indiv_mode, other_income, brackets)
+    else:
+        sh_tax = (cash+stock) * withhold
+
+    company_tax_total = corp_tax + undist_tax
+    total_all = company_tax_total + sh_tax
+    return {
+        "pretax": pretax,
+        "corp_tax": corp_tax,
+        "after_tax": after_tax,
+        "to_legal": to_legal,
+        "dist_base": dist_base,
+        "cash": cash,
+        "stock": stock,
+        "keep": keep,
+        "undist_tax": undist_tax,
+        "sh_tax": sh_tax,
+        "company_tax_total": company_tax_total,
+        "total_all": total_all,
+        "effective_rate": (total_all/pretax) if pretax else 0.0,
+    }
+
+
+def indiv_div_tax_batch(dividend, mode, other_income, brackets) -> np.ndarray:
+    """indiv_div_tax 的向量化版本（參數可為陣列）"""
+    dividend = np.asarray(dividend, dtype=float)
+    taxable = np.asarray(other_income, dtype=float) + dividend
+    tax = np.zeros(np.broadcast(taxable, dividend).shape)
+    for th, rate in brackets:
+        tax = np.where(taxable > th, (taxable - th) * rate, tax)
+    credit = np.minimum(dividend * 0.085, 80000.0)
+    integrate = np.maximum(0.0, tax - credit)
+    return np.where(np.asarray(mode) == "split28", 0.28 * dividend, integrate)
+
+
+def compute_single_year_batch(pretax, init_capital, corp_tax_rate, corp_amt_min, legal_on, lr_rate, lr_cap,
+                              undist_rate, cash_pct, stock_pct, shareholder_kind, indiv_mode="split28",
+                              other_income=0.0, withhold=0.0,
+                              brackets: List[Tuple[float, float]] = DEFAULT_BRACKETS) -> Dict[str, np.ndarray]:
+    """compute_single_year 的向量化版本：各參數可為等長陣列或純量，回傳同名欄位的陣列"""
+    pretax = np.asarray(pretax, dtype=float)
+    corp_tax = np.maximum(pretax*np.asarray(corp_tax_rate, dtype=float), pretax*np.asarray(corp_amt_min, dtype=float))
+    after_tax = np.maximum(0.0, pretax - corp_tax)
+    legal_reserve = 0.0
+    room = np.maximum(0.0, np.asarray(init_capital, dtype=float) * lr_cap - legal_reserve)
+    to_legal = np.where(np.asarray(legal_on, dtype=bool), np.minimum(after_tax * lr_rate, room), 0.0)
+    dist_base = np.maximum(0.0, after_tax - to_legal)
+    cash = dist_base * cash_pct
+    stock = dist_base * stock_pct
+    keep = np.maximum(0.0, dist_base - cash - stock)
+    undist_tax = keep * undist_rate
+    kind = np.asarray(shareholder_kind)
+    sh_tax = np.where(kind == "corporate_resident", 0.0,
+                      np.where(kind == "individual_resident",
+                               indiv_div_tax_batch(cash+stock, indiv_mode, other_income, brackets),
+                               (cash+stock) * np.asarray(withhold, dtype=float)))
+    company_tax_total = corp_tax + undist_tax
+    total_all = company_tax_total + sh_tax
+    out = {
+        "pretax": pretax,
+        "corp_tax": corp_tax,
+        "after_tax": after_tax,
+        "to_legal": to_legal,
+        "dist_base": dist_base,
+        "cash": cash,
+        "stock": stock,
+        "keep": keep,
+        "undist_tax": undist_tax,
+        "sh_tax": sh_tax,
+        "company_tax_total": company_tax_total,
+        "total_all": total_all,
+        "effective_rate": np.divide(total_all, pretax, out=np.zeros(np.broadcast(total_all, pretax).shape),
+                                    where=pretax != 0),
+    }
+    shape = np.broadcast(*out.values()).shape
+    return {k: np.broadcast_to(v, shape) for k, v in out.items()}
+
+
+# ===============================
+# 3. 表格（原始數值，格式化交由呈現端）
+# ===============================
+def company_table(result: Dict[str, float]) -> pd.DataFrame:
+    """公司層明細"""
+    return pd.DataFrame([
+        {"項目":"稅前盈餘","金額":result["pretax"]},
+        {"項目":"公司所得稅 / AMT","金額":result["corp_tax"]},
+        {"項目":"稅後盈餘","金額":result["after_tax"]},
+        {"項目":"提列法定盈餘公積","金額":result["to_legal"]},
+        {"項目":"可分配盈餘","金額":result["dist_base"]},
+        {"項目":"保留盈餘（未分配）","金額":result["keep"]},
+        {"項目":"未分配盈餘稅","金額":result["undist_tax"]},
+        {"項目":"公司層合計稅","金額":result["company_tax_total"]},
+    ])
+
+
+def shareholder_table(result: Dict[str, float]) -> pd.DataFrame:
+    """股東層明細"""
+    cash, stock, sh_tax = result["cash"], result["stock"], result["sh_tax"]
+    return pd.DataFrame([
+        {"項目":"發放現金股利","金額":cash},
+        {"項目":"發放股票股利","金額":stock},
+        {"項目":"股東層所得稅","金額":sh_tax},
+        {"項目":"股東實領淨額（含股利）","金額":cash+stock-sh_tax},
+    ])
+
+
+def total_table(result: Dict[str, float]) -> pd.DataFrame:
+    """總結"""
+    return pd.DataFrame([{
+        "公司層合計稅": result["company_tax_total"],
+        "股東層稅": result["sh_tax"],
+        "本年總稅負": result["total_all"],
+        "有效稅率(總稅/稅前盈餘)": result["effective_rate"]
+    }])
+
+
+# ===============================
+# 4. 圖表
+# ===============================
+def build_company_tax_figure(result: Dict[str, float]) -> go.Figure:
+    """公司層稅負長條圖"""
+    labels1 = ["公司稅", "未分配盈餘稅"]
+    values1 = [result["corp_tax"], result["undist_tax"]]
+    fig1 = go.Figure(data=[go.Bar(x=labels1, y=values1, text=[f"{v:,.0f}" for v in values1], textposition="auto")])
+    fig1.update_layout(title="公司層稅負", yaxis_title="金額（元）", margin=dict(l=10,r=10,t=40,b=10))
+    return fig1
+
+
+def build_shareholder_tax_figure(result: Dict[str, float]) -> go.Figure:
+    """股東層稅負長條圖"""
+    labels2 = ["股東層稅"]
+    values2 = [result["sh_tax"]]
+    fig2 = go.Figure(data=[go.Bar(x=labels2, y=values2, text=[f"{v:,.0f}" for v in values2], textposition="auto")])
+    fig2.update_layout(title="股東層稅負", yaxis_title="金額（元）", margin=dict(l=10,r=10,t=40,b=10))
+    return fig2
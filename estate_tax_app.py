@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import math
 import plotly.express as px
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Optional
 from datetime import datetime
 import time
 from dataclasses import dataclass, field
@@ -30,6 +31,10 @@ class TaxConstants:
     )
 
 
+# 介面上各家庭成員數的上限
+FAMILY_LIMITS: Dict[str, int] = {"adult_children": 10, "parents": 2, "other_dependents": 5}
+
+
 # ===============================
 # 2. 稅務計算邏輯
 # ===============================
@@ -39,6 +44,22 @@ class EstateTaxCalculator:
     def __init__(self, constants: TaxConstants):
         self.constants = constants
 
+    @staticmethod
+    def check_family(spouse: bool, adult_children: int, other_dependents: int,
+                     disabled_people: int, parents: int) -> None:
+        """家庭成員限制（同頁面）：人數不得為負或超過 FAMILY_LIMITS，
+        重度身心障礙者不得多於配偶＋子女＋父母；不合法時丟出 ValueError"""
+        counts = {"adult_children": adult_children, "other_dependents": other_dependents,
+                  "disabled_people": disabled_people, "parents": parents}
+        for name, n in counts.items():
+            if n < 0:
+                raise ValueError(f"{name} 不得為負數")
+            if name in FAMILY_LIMITS and n > FAMILY_LIMITS[name]:
+                raise ValueError(f"{name} 不得超過 {FAMILY_LIMITS[name]}")
+        max_disabled = (1 if spouse else 0) + adult_children + parents
+        if disabled_people > max_disabled:
+            raise ValueError(f"disabled_people 不得多於配偶＋子女＋父母（{max_disabled}）")
+
     def compute_deductions(self, spouse: bool, adult_children: int, other_dependents: int,
                            disabled_people: int, parents: int) -> float:
         """計算總扣除額"""
@@ -70,10 +91,45 @@ class EstateTaxCalculator:
                 previous_bracket = bracket
         return taxable_amount, round(tax_due, 0), deductions
 
+    def compute_deductions_batch(self, spouse, adult_children, other_dependents,
+                                 disabled_people, parents) -> np.ndarray:
+        """計算總扣除額（向量化，參數可為陣列）"""
+        c = self.constants
+        return (
+            np.asarray(spouse, dtype=float) * c.SPOUSE_DEDUCTION_VALUE +
+            c.FUNERAL_EXPENSE +
+            np.asarray(disabled_people, dtype=float) * c.DISABLED_DEDUCTION +
+            np.asarray(adult_children, dtype=float) * c.ADULT_CHILD_DEDUCTION +
+            np.asarray(other_dependents, dtype=float) * c.OTHER_DEPENDENTS_DEDUCTION +
+            np.asarray(parents, dtype=float) * c.PARENTS_DEDUCTION
+        )
+
+    def calculate_estate_tax_batch(self, total_assets, spouse, adult_children, other_dependents,
+                                   disabled_people, parents) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """計算遺產稅（向量化）：結果與 calculate_estate_tax 逐筆一致"""
+        deductions = self.compute_deductions_batch(spouse, adult_children, other_dependents, disabled_people, parents)
+        total_assets = np.asarray(total_assets, dtype=float)
+        taxable_amount = np.maximum(0.0, total_assets - self.constants.EXEMPT_AMOUNT - deductions)
+        tax_due = np.zeros_like(taxable_amount)
+        previous_bracket = 0.0
+        for bracket, rate in self.constants.TAX_BRACKETS:
+            tax_due += np.clip(np.minimum(taxable_amount, bracket) - previous_bracket, 0.0, None) * rate
+            previous_bracket = bracket
+        return taxable_amount, np.round(tax_due, 0), deductions
+
 
 # ===============================
 # 3. 模擬試算邏輯
 # ===============================
+CASE_STRATEGIES = [
+    "沒有規劃",
+    "提前贈與",
+    "購買保險",
+    "提前贈與＋購買保險",
+    "提前贈與＋購買保險（被實質課稅）"
+]
+
+
 class EstateTaxSimulator:
     """遺產稅模擬試算器"""
 
@@ -153,6 +209,173 @@ class EstateTaxSimulator:
             }
         }
 
+    def default_case_inputs(self, total_assets: float, tax_due: float) -> Tuple[int, int, int]:
+        """案例模擬預設值：保費、理賠金、提前贈與"""
+        default_premium = int(math.ceil(tax_due / 10) * 10)
+        if default_premium > total_assets:
+            default_premium = total_assets
+        premium_val = default_premium
+        default_claim = int(premium_val * 1.5)
+        remaining = total_assets - premium_val
+        if remaining >= 244:
+            default_gift = 244
+        else:
+            default_gift = 0
+        return premium_val, default_claim, default_gift
+
+    @staticmethod
+    def check_case_inputs(total_assets: float, premium: float, claim: float, gift: float) -> None:
+        """案例模擬輸入限制（同頁面）：保費 ≤ 總資產、贈與 ≤ 總資產 − 保費；不合法時丟出 ValueError"""
+        if premium > total_assets:
+            raise ValueError("保費不得高於總資產")
+        if min(premium, claim, gift) < 0:
+            raise ValueError("保費、理賠金、提前贈與不得為負數")
+        if gift > total_assets - premium:
+            raise ValueError("提前贈與金額不得高於【總資產】-【保費】")
+
+    def resolve_case_inputs(self, total_assets: float, tax_due: float, premium: float = None,
+                            claim: float = None, gift: float = None) -> Tuple[float, float, float]:
+        """補齊案例模擬輸入：未提供者採 default_case_inputs，贈與預設值以【總資產】-【保費】為上限（同頁面）；
+        再以 check_case_inputs 檢查"""
+        default_premium, default_claim, default_gift = self.default_case_inputs(total_assets, tax_due)
+        premium = default_premium if premium is None else premium
+        claim = default_claim if claim is None else claim
+        gift = max(0, min(default_gift, total_assets - premium)) if gift is None else gift
+        self.check_case_inputs(total_assets, premium, claim, gift)
+        return premium, claim, gift
+
+    def simulate_case_plans(self, total_assets: float, spouse: bool, adult_children: int,
+                            other_dependents: int, disabled_people: int, parents: int,
+                            premium: float, claim: float, gift: float) -> pd.DataFrame:
+        """案例模擬：比較各規劃策略下的遺產稅與家人總共取得"""
+        _, tax_case_no_plan, _ = self.calculator.calculate_estate_tax(
+            total_assets, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+        net_case_no_plan = total_assets - tax_case_no_plan
+
+        effective_case_gift = total_assets - gift
+        _, tax_case_gift, _ = self.calculator.calculate_estate_tax(
+            effective_case_gift, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+        net_case_gift = effective_case_gift - tax_case_gift + gift
+
+        effective_case_insurance = total_assets - premium
+        _, tax_case_insurance, _ = self.calculator.calculate_estate_tax(
+            effective_case_insurance, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+        net_case_insurance = effective_case_insurance - tax_case_insurance + claim
+
+        effective_case_combo_not_tax = total_assets - gift - premium
+        _, tax_case_combo_not_tax, _ = self.calculator.calculate_estate_tax(
+            effective_case_combo_not_tax, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+        net_case_combo_not_tax = effective_case_combo_not_tax - tax_case_combo_not_tax + claim + gift
+
+        effective_case_combo_tax = total_assets - gift - premium + claim
+        _, tax_case_combo_tax, _ = self.calculator.calculate_estate_tax(
+            effective_case_combo_tax, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+        net_case_combo_tax = effective_case_combo_tax - tax_case_combo_tax + gift
+
+        case_data = {
+            "規劃策略": list(CASE_STRATEGIES),
+            "遺產稅（萬）": [
+                int(tax_case_no_plan),
+                int(tax_case_gift),
+                int(tax_case_insurance),
+                int(tax_case_combo_not_tax),
+                int(tax_case_combo_tax)
+            ],
+            "家人總共取得（萬）": [
+                int(net_case_no_plan),
+                int(net_case_gift),
+                int(net_case_insurance),
+                int(net_case_combo_not_tax),
+                int(net_case_combo_tax)
+            ]
+        }
+        df_case_results = pd.DataFrame(case_data)
+        baseline_value = df_case_results.loc[
+            df_case_results["規劃策略"] == "沒有規劃", "家人總共取得（萬）"
+        ].iloc[0]
+        df_case_results["規劃效益"] = df_case_results["家人總共取得（萬）"] - baseline_value
+        return df_case_results
+
+    def family_what_if(self, total_assets: float, spouse: bool, adult_children: int,
+                       other_dependents: int, disabled_people: int, parents: int,
+                       radius: Optional[int] = None) -> pd.DataFrame:
+        """家庭成員變動試算：列出介面上限（FAMILY_LIMITS、max_disabled）內所有合法的家庭組合（配偶有／無），
+        一次向量化計算扣除額與遺產稅；radius 指定時，各類成員只列目前人數 ± radius 以內"""
+        def around(v, hi):
+            if radius is None:
+                return list(range(hi + 1))
+            return list(range(max(0, v - radius), min(hi, v + radius) + 1))
+
+        grid = np.array(np.meshgrid(
+            [0, 1],
+            around(adult_children, FAMILY_LIMITS["adult_children"]),
+            around(parents, FAMILY_LIMITS["parents"]),
+            around(other_dependents, FAMILY_LIMITS["other_dependents"]),
+            around(disabled_people, FAMILY_LIMITS["adult_children"] + FAMILY_LIMITS["parents"] + 1),
+            indexing="ij"
+        )).reshape(5, -1)
+        sp, ch, par, ot, di = grid
+        # 重度身心障礙者須為配偶、子女或父母之一（同介面 max_disabled）
+        valid = di <= sp + ch + par
+        sp, ch, par, ot, di = sp[valid], ch[valid], par[valid], ot[valid], di[valid]
+
+        taxable, tax, deductions = self.calculator.calculate_estate_tax_batch(
+            np.full(sp.shape, total_assets, dtype=float), sp.astype(bool), ch, ot, di, par
+        )
+        _, tax_now, _ = self.calculator.calculate_estate_tax_batch(
+            total_assets, spouse, adult_children, other_dependents, disabled_people, parents
+        )
+
+        changes = []
+        for row in zip(sp, ch, par, di, ot):
+            parts = []
+            for label, new, old in zip(["配偶", "子女", "父母", "重度身心障礙", "其他撫養"], row,
+                                       [int(spouse), adult_children, parents, disabled_people, other_dependents]):
+                if new != old:
+                    parts.append(f"{label}{int(new) - int(old):+d}")
+            changes.append("、".join(parts) if parts else "目前狀況")
+
+        df = pd.DataFrame({
+            "變動項目": changes,
+            "配偶": np.where(sp == 1, "有", "無"),
+            "子女": ch,
+            "父母": par,
+            "重度身心障礙": di,
+            "其他撫養": ot,
+            "扣除額（萬）": deductions,
+            "課稅遺產淨額（萬）": taxable,
+            "預估遺產稅（萬）": tax,
+            "與目前差額（萬）": tax - float(tax_now),
+        })
+        return df.sort_values("預估遺產稅（萬）", kind="stable").reset_index(drop=True)
+
+    def simulate_case_plans_batch(self, total_assets, spouse, adult_children, other_dependents,
+                                  disabled_people, parents, premium, claim, gift) -> Tuple[np.ndarray, np.ndarray]:
+        """案例模擬（向量化）：回傳 (遺產稅, 家人總共取得)，形狀皆為 (N, len(CASE_STRATEGIES))"""
+        total_assets, premium, claim, gift = (np.asarray(a, dtype=float) for a in (total_assets, premium, claim, gift))
+        zero = np.zeros_like(total_assets)
+        # 各策略：(計入遺產的資產, 遺產外另行取得的金額)
+        estates = np.stack([
+            total_assets,
+            total_assets - gift,
+            total_assets - premium,
+            total_assets - gift - premium,
+            total_assets - gift - premium + claim,
+        ], axis=1)
+        outside = np.stack([zero, gift, claim, claim + gift, gift], axis=1)
+        k = estates.shape[1]
+        family = [np.repeat(np.asarray(a), k) if np.ndim(a) else a
+                  for a in (spouse, adult_children, other_dependents, disabled_people, parents)]
+        _, tax, _ = self.calculator.calculate_estate_tax_batch(estates.ravel(), *family)
+        tax = tax.reshape(estates.shape)
+        net = estates - tax + outside
+        return np.trunc(tax).astype(np.int64), np.trunc(net).astype(np.int64)
+
 
 # ===============================
 # 4. 登入驗證（保護區用）
@@ -180,14 +403,65 @@ def check_credentials(input_username: str, input_password: str) -> (bool, str):
 
 
 # ===============================
-# 5. Streamlit 介面
+# 5. 圖表
+# ===============================
+def build_case_figure(df_case_results: pd.DataFrame):
+    """不同規劃策略下家人總共取得金額比較圖"""
+    df_viz_case = df_case_results.copy()
+    fig_bar_case = px.bar(
+        df_viz_case,
+        x="規劃策略",
+        y="家人總共取得（萬）",
+        title="不同規劃策略下家人總共取得金額比較（案例）",
+        text="家人總共取得（萬）"
+    )
+    fig_bar_case.update_traces(texttemplate='%{text:.0f}', textposition='outside')
+    baseline_case = df_viz_case.loc[
+        df_viz_case["規劃策略"] == "沒有規劃", "家人總共取得（萬）"
+    ].iloc[0]
+    # 將 "規劃效益" 標籤顯示在每個 bar 的垂直中間
+    for idx, row in df_viz_case.iterrows():
+        if row["規劃策略"] != "沒有規劃":
+            diff = row["家人總共取得（萬）"] - baseline_case
+            diff_text = f"+{int(diff)}" if diff >= 0 else f"{int(diff)}"
+            fig_bar_case.add_annotation(
+                x=row["規劃策略"],
+                y=row["家人總共取得（萬）"] / 2,
+                text=diff_text,
+                showarrow=False,
+                font=dict(color="yellow", size=20)
+            )
+    max_value = df_viz_case["家人總共取得（萬）"].max()
+    dtick = max_value / 10
+    fig_bar_case.update_layout(
+        margin=dict(t=150, b=150, l=50, r=50),
+        yaxis_range=[0, max_value + dtick * 4],
+        autosize=True,
+        height=600,
+        font=dict(size=20),
+        title_font=dict(size=24),
+        xaxis_title={'text': "規劃策略", 'font': {'size': 20, 'color': 'black'}},
+        yaxis_title={'text': "家人總共取得（萬）", 'font': {'size': 20, 'color': 'black'}},
+        xaxis=dict(tickfont=dict(size=20)),
+        yaxis=dict(tickfont=dict(size=20))
+    )
+    return fig_bar_case
+
+
+# ===============================
+# 6. Streamlit 介面
 # ===============================
 class EstateTaxUI:
     """介面"""
 
-    def __init__(self, calculator: EstateTaxCalculator, simulator: EstateTaxSimulator):
+    def __init__(self, calculator: EstateTaxCalculator, simulator: EstateTaxSimulator,
+                 usage_recorder=None, scenario_store=None):
         self.calculator = calculator
         self.simulator = simulator
+        # usage_recorder(kind, profile)：記錄輸入組合供預熱使用（可省略）
+        self.usage_recorder = usage_recorder
+        # scenario_store：scenario_store.ScenarioStore，提供方案儲存與跨客戶比較（可省略）
+        self.scenario_store = scenario_store
 
     def render_ui(self):
         """渲染 Streamlit 介面"""
@@ -236,11 +510,11 @@ class EstateTaxUI:
             st.markdown("### 請輸入家庭成員數")
             has_spouse = st.checkbox("是否有配偶（扣除額 553 萬）", value=False)
             adult_children_input = st.number_input(
-                "直系血親卑親屬數（每人 56 萬）", min_value=0, max_value=10,
+                "直系血親卑親屬數（每人 56 萬）", min_value=0, max_value=FAMILY_LIMITS["adult_children"],
                 value=0, help="請輸入直系血親或卑親屬人數"
             )
             parents_input = st.number_input(
-                "父母數（每人 138 萬，最多 2 人）", min_value=0, max_value=2,
+                "父母數（每人 138 萬，最多 2 人）", min_value=0, max_value=FAMILY_LIMITS["parents"],
                 value=0, help="請輸入父母人數"
             )
             max_disabled = (1 if has_spouse else 0) + adult_children_input + parents_input
@@ -249,7 +523,7 @@ class EstateTaxUI:
                 value=0, help="請輸入重度以上身心障礙者人數"
             )
             other_dependents_input = st.number_input(
-                "受撫養之兄弟姊妹、祖父母數（每人 56 萬）", min_value=0, max_value=5,
+                "受撫養之兄弟姊妹、祖父母數（每人 56 萬）", min_value=0, max_value=FAMILY_LIMITS["other_dependents"],
                 value=0, help="請輸入兄弟姊妹或祖父母人數"
             )
 
@@ -261,41 +535,49 @@ class EstateTaxUI:
         except Exception as e:
             st.error(f"計算遺產稅時發生錯誤：{e}")
             return
+        if self.usage_recorder:
+            self.usage_recorder("estate", {
+                "total_assets": total_assets_input, "spouse": has_spouse,
+                "adult_children": adult_children_input, "other_dependents": other_dependents_input,
+                "disabled_people": disabled_people_input, "parents": parents_input
+            })
 
         st.markdown("## 預估遺產稅：{0:,.0f} 萬元".format(tax_due), unsafe_allow_html=True)
 
+        from presentation import estate_summary_view, show_table
+
+        c = self.calculator.constants
+        df_assets, df_deductions, df_tax = estate_summary_view(
+            total_assets_input,
+            (
+                ("免稅額", c.EXEMPT_AMOUNT),
+                ("喪葬費扣除額", c.FUNERAL_EXPENSE),
+                ("配偶扣除額", c.SPOUSE_DEDUCTION_VALUE if has_spouse else 0),
+                ("直系血親卑親屬扣除額", adult_children_input * c.ADULT_CHILD_DEDUCTION),
+                ("父母扣除額", parents_input * c.PARENTS_DEDUCTION),
+                ("重度身心障礙扣除額", disabled_people_input * c.DISABLED_DEDUCTION),
+                ("其他撫養扣除額", other_dependents_input * c.OTHER_DEPENDENTS_DEDUCTION),
+            ),
+            taxable_amount, tax_due
+        )
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown("**資產概況**")
-            df_assets = pd.DataFrame({"項目": ["總資產"], "金額（萬）": [int(total_assets_input)]})
-            st.table(df_assets)
+            show_table(df_assets, money=["金額（萬）"])
         with col2:
             st.markdown("**扣除項目**")
-            df_deductions = pd.DataFrame({
-                "項目": [
-                    "免稅額", "喪葬費扣除額", "配偶扣除額",
-                    "直系血親卑親屬扣除額", "父母扣除額",
-                    "重度身心障礙扣除額", "其他撫養扣除額"
-                ],
-                "金額（萬）": [
-                    self.calculator.constants.EXEMPT_AMOUNT,
-                    self.calculator.constants.FUNERAL_EXPENSE,
-                    self.calculator.constants.SPOUSE_DEDUCTION_VALUE if has_spouse else 0,
-                    adult_children_input * self.calculator.constants.ADULT_CHILD_DEDUCTION,
-                    parents_input * self.calculator.constants.PARENTS_DEDUCTION,
-                    disabled_people_input * self.calculator.constants.DISABLED_DEDUCTION,
-                    other_dependents_input * self.calculator.constants.OTHER_DEPENDENTS_DEDUCTION
-                ]
-            })
-            df_deductions["金額（萬）"] = df_deductions["金額（萬）"].astype(int)
-            st.table(df_deductions)
+            show_table(df_deductions, money=["金額（萬）"])
         with col3:
             st.markdown("**稅務計算**")
-            df_tax = pd.DataFrame({
-                "項目": ["課稅遺產淨額", "預估遺產稅"],
-                "金額（萬）": [int(taxable_amount), int(tax_due)]
-            })
-            st.table(df_tax)
+            show_table(df_tax, money=["金額（萬）"])
+
+        with st.expander("家庭成員變動試算（介面上限內所有家庭組合）"):
+            df_what_if = self.simulator.family_what_if(
+                total_assets_input, has_spouse, adult_children_input,
+                other_dependents_input, disabled_people_input, parents_input
+            )
+            st.caption(f"共 {len(df_what_if)} 種家庭組合；點欄位標題可排序")
+            show_table(df_what_if, money=["扣除額（萬）", "課稅遺產淨額（萬）", "預估遺產稅（萬）", "與目前差額（萬）"])
 
         st.markdown("---")
         st.markdown("## 家族傳承策略建議")
@@ -340,16 +622,9 @@ class EstateTaxUI:
             CASE_DISABLED = disabled_people_input
             CASE_OTHER = other_dependents_input
 
-            default_premium = int(math.ceil(tax_due / 10) * 10)
-            if default_premium > CASE_TOTAL_ASSETS:
-                default_premium = CASE_TOTAL_ASSETS
-            premium_val = default_premium
-            default_claim = int(premium_val * 1.5)
-            remaining = CASE_TOTAL_ASSETS - premium_val
-            if remaining >= 244:
-                default_gift = 244
-            else:
-                default_gift = 0
+            premium_val, default_claim, default_gift = self.simulator.default_case_inputs(
+                CASE_TOTAL_ASSETS, tax_due
+            )
 
             premium_case = st.number_input(
                 "購買保險保費（萬）",
@@ -384,68 +659,11 @@ class EstateTaxUI:
             if gift_case > CASE_TOTAL_ASSETS - premium_case:
                 st.error("錯誤：提前贈與金額不得高於【總資產】-【保費】！")
 
-            _, tax_case_no_plan, _ = self.calculator.calculate_estate_tax(
+            df_case_results = self.simulator.simulate_case_plans(
                 CASE_TOTAL_ASSETS, CASE_SPOUSE, CASE_ADULT_CHILDREN,
-                CASE_OTHER, CASE_DISABLED, CASE_PARENTS
-            )
-            net_case_no_plan = CASE_TOTAL_ASSETS - tax_case_no_plan
-
-            effective_case_gift = CASE_TOTAL_ASSETS - gift_case
-            _, tax_case_gift, _ = self.calculator.calculate_estate_tax(
-                effective_case_gift, CASE_SPOUSE, CASE_ADULT_CHILDREN,
-                CASE_OTHER, CASE_DISABLED, CASE_PARENTS
-            )
-            net_case_gift = effective_case_gift - tax_case_gift + gift_case
-
-            effective_case_insurance = CASE_TOTAL_ASSETS - premium_case
-            _, tax_case_insurance, _ = self.calculator.calculate_estate_tax(
-                effective_case_insurance, CASE_SPOUSE, CASE_ADULT_CHILDREN,
-                CASE_OTHER, CASE_DISABLED, CASE_PARENTS
-            )
-            net_case_insurance = effective_case_insurance - tax_case_insurance + claim_case
-
-            effective_case_combo_not_tax = CASE_TOTAL_ASSETS - gift_case - premium_case
-            _, tax_case_combo_not_tax, _ = self.calculator.calculate_estate_tax(
-                effective_case_combo_not_tax, CASE_SPOUSE, CASE_ADULT_CHILDREN,
-                CASE_OTHER, CASE_DISABLED, CASE_PARENTS
-            )
-            net_case_combo_not_tax = effective_case_combo_not_tax - tax_case_combo_not_tax + claim_case + gift_case
-
-            effective_case_combo_tax = CASE_TOTAL_ASSETS - gift_case - premium_case + claim_case
-            _, tax_case_combo_tax, _ = self.calculator.calculate_estate_tax(
-                effective_case_combo_tax, CASE_SPOUSE, CASE_ADULT_CHILDREN,
-                CASE_OTHER, CASE_DISABLED, CASE_PARENTS
+                CASE_OTHER, CASE_DISABLED, CASE_PARENTS,
+                premium_case, claim_case, gift_case
             )
-            net_case_combo_tax = effective_case_combo_tax - tax_case_combo_tax + gift_case
-
-            case_data = {
-                "規劃策略": [
-                    "沒有規劃",
-                    "提前贈與",
-                    "購買保險",
-                    "提前贈與＋購買保險",
-                    "提前贈與＋購買保險（被實質課稅）"
-                ],
-                "遺產稅（萬）": [
-                    int(tax_case_no_plan),
-                    int(tax_case_gift),
-                    int(tax_case_insurance),
-                    int(tax_case_combo_not_tax),
-                    int(tax_case_combo_tax)
-                ],
-                "家人總共取得（萬）": [
-                    int(net_case_no_plan),
-                    int(net_case_gift),
-                    int(net_case_insurance),
-                    int(net_case_combo_not_tax),
-                    int(net_case_combo_tax)
-                ]
-            }
-            df_case_results = pd.DataFrame(case_data)
-            baseline_value = df_case_results.loc[
-                df_case_results["規劃策略"] == "沒有規劃", "家人總共取得（萬）"
-            ].iloc[0]
-            df_case_results["規劃效益"] = df_case_results["家人總共取得（萬）"] - baseline_value
 
             st.markdown("### 案例模擬結果")
             family_status = ""
@@ -453,53 +671,64 @@ class EstateTaxUI:
                 family_status += "配偶, "
             family_status += f"子女{CASE_ADULT_CHILDREN}人, 父母{CASE_PARENTS}人, 重度身心障礙者{CASE_DISABLED}人, 其他撫養{CASE_OTHER}人"
             st.markdown(f"**總資產：{int(CASE_TOTAL_ASSETS):,d} 萬**  |  **家庭狀況：{family_status}**")
-            st.table(df_case_results)
-
-            df_viz_case = df_case_results.copy()
-            fig_bar_case = px.bar(
-                df_viz_case,
-                x="規劃策略",
-                y="家人總共取得（萬）",
-                title="不同規劃策略下家人總共取得金額比較（案例）",
-                text="家人總共取得（萬）"
-            )
-            fig_bar_case.update_traces(texttemplate='%{text:.0f}', textposition='outside')
-            baseline_case = df_viz_case.loc[
-                df_viz_case["規劃策略"] == "沒有規劃", "家人總共取得（萬）"
-            ].iloc[0]
-            # 將 "規劃效益" 標籤顯示在每個 bar 的垂直中間
-            for idx, row in df_viz_case.iterrows():
-                if row["規劃策略"] != "沒有規劃":
-                    diff = row["家人總共取得（萬）"] - baseline_case
-                    diff_text = f"+{int(diff)}" if diff >= 0 else f"{int(diff)}"
-                    fig_bar_case.add_annotation(
-                        x=row["規劃策略"],
-                        y=row["家人總共取得（萬）"] / 2,
-                        text=diff_text,
-                        showarrow=False,
-                        font=dict(color="yellow", size=20)
-                    )
-            max_value = df_viz_case["家人總共取得（萬）"].max()
-            dtick = max_value / 10
-            fig_bar_case.update_layout(
-                margin=dict(t=150, b=150, l=50, r=50),
-                yaxis_range=[0, max_value + dtick * 4],
-                autosize=True,
-                height=600,
-                font=dict(size=20),
-                title_font=dict(size=24),
-                xaxis_title={'text': "規劃策略", 'font': {'size': 20, 'color': 'black'}},
-                yaxis_title={'text': "家人總共取得（萬）", 'font': {'size': 20, 'color': 'black'}},
-                xaxis=dict(tickfont=dict(size=20)),
-                yaxis=dict(tickfont=dict(size=20))
-            )
+            show_table(df_case_results, money=["遺產稅（萬）", "家人總共取得（萬）", "規劃效益"])
+
+            fig_bar_case = build_case_figure(df_case_results)
             st.plotly_chart(fig_bar_case, use_container_width=True)
 
+            if self.scenario_store is not None:
+                self.render_scenario_store(
+                    CASE_TOTAL_ASSETS, CASE_SPOUSE, CASE_ADULT_CHILDREN, CASE_PARENTS,
+                    CASE_DISABLED, CASE_OTHER, premium_case, claim_case, gift_case, df_case_results
+                )
+
         st.markdown("---")
         st.markdown("## 想了解更多？")
         st.markdown("歡迎前往 **永傳家族辦公室**，我們提供專業的家族傳承與財富規劃服務。")
         st.markdown("[點此前往官網](https://www.gracefo.com)", unsafe_allow_html=True)
 
+    def render_scenario_store(self, total_assets, spouse, adult_children, parents, disabled_people,
+                              other_dependents, premium, claim, gift, df_case_results):
+        """儲存本次案例模擬，並提供跨客戶方案篩選"""
+        import pyarrow.compute as pc
+        from presentation import show_table
+        from scenario_store import scenario_record, STRATEGY_KEYS
+
+        st.markdown("### 儲存方案")
+        client_name = st.text_input("客戶名稱", key="scenario_client")
+        if st.button("儲存此方案", key="scenario_save"):
+            if not client_name.strip():
+                st.error("請輸入客戶名稱")
+            else:
+                rec = scenario_record(
+                    client_name.strip(), st.session_state.get("user_name", ""), total_assets, spouse,
+                    adult_children, parents, disabled_people, other_dependents,
+                    premium, claim, gift, df_case_results
+                )
+                self.scenario_store.append([rec])
+                st.success(f"已儲存「{client_name.strip()}」的方案")
+
+        with st.expander("跨客戶方案比較"):
+            strategy_names = dict(zip(STRATEGY_KEYS, CASE_STRATEGIES))
+            col_a, col_b = st.columns(2)
+            with col_a:
+                key = st.selectbox("規劃策略", STRATEGY_KEYS[1:], index=2,
+                                   format_func=lambda k: strategy_names[k], key="scenario_strategy")
+            with col_b:
+                min_benefit = st.number_input("規劃效益至少（萬）", value=500, step=100, key="scenario_min_benefit")
+            matched = self.scenario_store.latest_by_client(pc.field(f"{key}_benefit") > min_benefit)
+            st.markdown(f"符合條件客戶：**{matched.num_rows}** 位（每位客戶取最近一次儲存的方案）")
+            if matched.num_rows:
+                benefit = matched.column(f"{key}_benefit")
+                st.markdown(
+                    f"平均規劃效益：{pc.mean(benefit).as_py():,.0f} 萬｜合計：{pc.sum(benefit).as_py():,.0f} 萬"
+                )
+                df_matched = matched.select([
+                    "client", "saved_at", "total_assets", f"{key}_tax", f"{key}_net", f"{key}_benefit"
+                ]).to_pandas().sort_values(f"{key}_benefit", ascending=False)
+                df_matched.columns = ["客戶", "儲存時間", "總資產（萬）", "遺產稅（萬）", "家人總共取得（萬）", "規劃效益"]
+                show_table(df_matched, money=["總資產（萬）", "遺產稅（萬）", "家人總共取得（萬）", "規劃效益"])
+
 
 if __name__ == "__main__":
     constants = TaxConstants()
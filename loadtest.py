@@ -0,0 +1,267 @@
+"""並行 Session 壓測（離線，使用 streamlit.testing.v1.AppTest）
+
+每個模擬 Session：載入 app.py → 於模組三登入表單登入 → 反覆修改模組一、模組三的輸入並重跑。
+統計重跑延遲 p50／p95／p99、吞吐量，以及每個程序的記憶體（RSS）隨時間變化，
+用來估算單一實例可服務的顧問數、抓出快取持續成長的問題。
+
+說明：
+- app.py 的 `login_gate` 目前沒有在頁面上呼叫；實際可登入的是模組三內建的登入表單，故以該表單登入。
+- Streamlit 每次重跑都會執行所有分頁內容，「切換分頁」不會改變伺服器端工作量，因此以修改兩個模組的輸入代表。
+- AppTest 的 Runtime 是程序層級的全域物件，同一程序內的重跑會依序執行（以鎖排隊，延遲含排隊時間，
+  相當於真實伺服器單一程序受 GIL 限制的情況）；真正的平行由 --processes 模擬多個實例。
+- 延遲包含 AppTest 解析輸出元素的成本，略高於真實瀏覽器連線下的伺服器端時間。
+
+用法：python loadtest.py --processes 2 --sessions 8 --iterations 20
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+APP_PATH = str(Path(__file__).with_name("app.py"))
+_RUN_LOCK = threading.Lock()
+TEST_USER = {"name": "壓測", "username": "loadtest", "password": "loadtest",
+             "start_date": "2000-01-01", "end_date": "2999-12-31"}
+
+
+# ===============================
+# 1. 記憶體取樣
+# ===============================
+def _rss_mb() -> float:
+    """目前程序的 RSS（MB）；非 Linux 時退回 ru_maxrss（峰值），Windows 無法取得時回傳 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        try:
+            import resource  # Windows 沒有此模組
+        except ImportError:
+            return 0.0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemorySampler(threading.Thread):
+    """背景每 interval 秒記錄一次 (經過秒數, RSS MB, 已完成重跑數)"""
+
+    def __init__(self, interval: float, counter: List[int]):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.counter = counter
+        self.samples: List[List[float]] = []
+        self._done = threading.Event()
+        self._t0 = time.perf_counter()
+
+    def run(self):
+        while not self._done.is_set():
+            self.samples.append([time.perf_counter() - self._t0, _rss_mb(), self.counter[0]])
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.samples.append([time.perf_counter() - self._t0, _rss_mb(), self.counter[0]])
+
+
+# ===============================
+# 2. 單一 Session
+# ===============================
+def _by_label(elements, label):
+    for w in elements:
+        if w.label == label:
+            return w
+    raise LookupError(f"widget not found: {label}")
+
+
+def _form_submit(at, form_id: str):
+    """依表單找送出按鈕（不依賴按鈕在頁面上的先後順序）"""
+    for b in at.button:
+        if b.proto.is_form_submitter and b.proto.form_id == form_id:
+            return b
+    raise LookupError(f"form submit button not found: {form_id}")
+
+
+def _actions(at, rng: random.Random):
+    """一次隨機輸入變更：(名稱, 套用函式)"""
+    return rng.choice([
+        ("tab1_pretax", lambda: _by_label(at.number_input, "當年度稅前盈餘").set_value(
+            rng.randrange(1_000_000, 200_000_000, 1_000_000))),
+        ("tab1_cash_pct", lambda: _by_label(at.slider, "現金股利 %").set_value(rng.choice([0.0, 0.3, 0.5, 1.0]))),
+        ("tab1_kind", lambda: _by_label(at.selectbox, "股東型別").set_value(
+            rng.choice(["本國個人", "本國法人", "非居民（外資）"]))),
+        ("tab3_assets", lambda: _by_label(at.number_input, "總資產（萬）").set_value(
+            rng.randrange(1000, 100000, 100))),
+        ("tab3_spouse", lambda: _by_label(at.checkbox, "是否有配偶（扣除額 553 萬）").set_value(rng.random() < 0.5)),
+        ("tab3_children", lambda: _by_label(at.number_input, "直系血親卑親屬數（每人 56 萬）").set_value(
+            rng.randrange(0, 5))),
+        ("tab3_premium", lambda: at.number_input(key="premium_case").set_value(rng.randrange(0, 1000, 100))),
+    ])
+
+
+def run_session(session_id: int, iterations: int, think_ms: float, secrets: Dict[str, Any],
+                record, timeout: float = 60):
+    """模擬一位顧問；每次重跑呼叫 record(步驟名稱, 秒數, 是否成功)"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(session_id)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for k, v in secrets.items():
+        at.secrets[k] = v
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            with _RUN_LOCK:
+                fn()
+                at.run()
+            ok = not at.exception
+        except Exception:
+            ok = False
+        record(name, time.perf_counter() - t0, ok)
+        if think_ms:
+            time.sleep(think_ms / 1000.0)
+
+    step("load", lambda: None)
+
+    def login():
+        at.text_input(key="login_form_username").set_value(TEST_USER["username"])
+        at.text_input(key="login_form_password").set_value(TEST_USER["password"])
+        _form_submit(at, "login_form").click()
+    step("login", login)
+
+    for _ in range(iterations):
+        name, fn = _actions(at, rng)
+        step(name, fn)
+
+
+# ===============================
+# 3. 單一程序（多個 Session 執行緒）
+# ===============================
+def run_process(proc_id: int, sessions: int, iterations: int, think_ms: float,
+                sample_interval: float, store_dir: str) -> Dict[str, Any]:
+    secrets = {
+        "authorized_users": {"loadtest": TEST_USER},
+        "scenario_store": {"path": os.path.join(store_dir, f"proc{proc_id}")},
+    }
+    latencies: List[List[Any]] = []
+    lock = threading.Lock()
+    counter = [0]
+
+    def record(name, seconds, ok):
+        with lock:
+            latencies.append([name, seconds, ok])
+            counter[0] += 1
+
+    sampler = MemorySampler(sample_interval, counter)
+    sampler.start()
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=run_session,
+                                args=(proc_id * 1000 + i, iterations, think_ms, secrets, record))
+               for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sampler.stop()
+    return {"proc_id": proc_id, "pid": os.getpid(), "elapsed": elapsed,
+            "latencies": latencies, "memory": sampler.samples}
+
+
+def _process_entry(kwargs):
+    return run_process(**kwargs)
+
+
+# ===============================
+# 4. 彙整
+# ===============================
+def _percentiles(seconds: List[float]) -> Dict[str, float]:
+    ms = np.array(seconds) * 1000
+    if not ms.size:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": int(ms.size), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "max_ms": float(ms.max())}
+
+
+def summarize(results: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    rows = [r for res in results for r in res["latencies"]]
+    ok_rows = [r for r in rows if r[2]]
+    per_step = {}
+    for name in sorted({r[0] for r in rows}):
+        per_step[name] = _percentiles([r[1] for r in ok_rows if r[0] == name])
+    memory = {}
+    for res in results:
+        mem = res["memory"]
+        start, end = mem[0][1], mem[-1][1]
+        memory[f"proc{res['proc_id']}"] = {
+            "pid": res["pid"], "rss_start_mb": start, "rss_end_mb": end, "rss_peak_mb": max(m[1] for m in mem),
+            "growth_mb": end - start,
+            # 穩定後（扣除前 1/4 暖機）的每 100 次重跑記憶體成長，持續為正代表快取或物件可能外洩
+            "growth_mb_per_100_reruns": _growth_rate(mem),
+            "samples": mem,
+        }
+    return {
+        "reruns": len(rows), "errors": len(rows) - len(ok_rows), "wall_seconds": wall,
+        "throughput_reruns_per_s": len(rows) / wall if wall else 0.0,
+        "latency": _percentiles([r[1] for r in ok_rows if r[0] != "load"]),
+        "per_step": per_step,
+        "memory": memory,
+    }
+
+
+def _growth_rate(samples: List[List[float]]) -> float:
+    mem = np.array(samples)
+    mem = mem[len(mem) // 4:]
+    if len(mem) < 2 or mem[-1, 2] == mem[0, 2]:
+        return 0.0
+    slope = np.polyfit(mem[:, 2], mem[:, 1], 1)[0]
+    return float(slope * 100)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="app.py 並行 Session 壓測（離線）")
+    ap.add_argument("--processes", type=int, default=1, help="程序數（模擬實例數）")
+    ap.add_argument("--sessions", type=int, default=4, help="每個程序的並行 Session 數")
+    ap.add_argument("--iterations", type=int, default=20, help="每個 Session 的輸入變更次數")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="每次重跑後的停頓（毫秒）")
+    ap.add_argument("--sample-interval", type=float, default=1.0, help="記憶體取樣間隔（秒）")
+    ap.add_argument("--json", help="另存完整結果（含記憶體時間序列）")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        jobs = [dict(proc_id=i, sessions=args.sessions, iterations=args.iterations, think_ms=args.think_ms,
+                     sample_interval=args.sample_interval, store_dir=store_dir)
+                for i in range(args.processes)]
+        t0 = time.perf_counter()
+        with mp.get_context("spawn").Pool(args.processes) as pool:
+            results = pool.map(_process_entry, jobs)
+        summary = summarize(results, time.perf_counter() - t0)
+
+    lat = summary["latency"]
+    print(f"重跑 {summary['reruns']} 次（失敗 {summary['errors']}），耗時 {summary['wall_seconds']:.1f}s，"
+          f"吞吐量 {summary['throughput_reruns_per_s']:.1f} 次/秒")
+    if lat.get("count"):
+        print(f"重跑延遲 p50 {lat['p50_ms']:.0f}ms｜p95 {lat['p95_ms']:.0f}ms｜p99 {lat['p99_ms']:.0f}ms")
+    for name, s in summary["per_step"].items():
+        if s.get("count"):
+            print(f"  {name:<14} n={s['count']:<5} p50 {s['p50_ms']:.0f}ms  p95 {s['p95_ms']:.0f}ms  p99 {s['p99_ms']:.0f}ms")
+    for name, m in summary["memory"].items():
+        print(f"{name}（pid {m['pid']}）RSS {m['rss_start_mb']:.0f} → {m['rss_end_mb']:.0f} MB"
+              f"（峰值 {m['rss_peak_mb']:.0f}，每 100 次重跑 {m['growth_mb_per_100_reruns']:+.1f} MB）")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""客戶 PDF 報告（批次產出）
+
+輸入為客戶清單（JSON 陣列），每位客戶：
+{
+  "client_id": "C001", "name": "王大明",
+  "dividend": {... compute_single_year 參數 ...},
+  "estate": {"total_assets": 5000, "spouse": true, "adult_children": 2, "other_dependents": 0,
+             "disabled_people": 0, "parents": 0, "premium": 300, "claim": 450, "gift": 244}
+}
+"dividend"／"estate" 皆可省略；premium／claim／gift 省略時採頁面預設值，
+並須符合頁面限制（保費 ≤ 總資產、贈與 ≤ 總資產 − 保費），否則該客戶列為失敗。
+client_id（或 name）為必填且不可重複，輸出檔名為清理後的 <client_id>.pdf。
+
+需 Python 3.11 以上（程序池使用 max_tasks_per_child，worker 以 spawn 啟動）。
+
+用法：python pdf_report.py clients.json out_dir --workers 4
+"""
+import argparse
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib import font_manager as _fm, rcParams as _rc
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+
+from dividend_tax import compute_single_year, company_table, shareholder_table, total_table
+
+
+# ===============================
+# 1. 字型（每個程序只註冊一次）
+# ===============================
+FONT_PATH = Path(__file__).with_name("NotoSansTC-Regular.ttf")
+_PDF_FONT: Optional[str] = None
+
+
+def setup_fonts(allow_fallback: bool = False) -> str:
+    """註冊 NotoSansTC（reportlab + matplotlib），回傳 PDF 字型名稱
+
+    TTFont 解析結果於程序內重複使用；每份 PDF 只內嵌實際用到的字形子集。
+    找不到或無法註冊字型時直接丟出例外（Helvetica 沒有中文字形，報告會一片空白）；
+    allow_fallback=True 才改用 Helvetica。
+    """
+    global _PDF_FONT
+    if _PDF_FONT:
+        return _PDF_FONT
+    try:
+        if not FONT_PATH.exists():
+            raise FileNotFoundError(f"找不到中文字型：{FONT_PATH}")
+        if "NotoSansTC" not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont("NotoSansTC", str(FONT_PATH)))
+        _fm.fontManager.addfont(str(FONT_PATH))
+        name = _fm.FontProperties(fname=str(FONT_PATH)).get_name()
+    except Exception as _e:
+        if not allow_fallback:
+            raise RuntimeError(f"PDF 字型設定失敗（{_e}）；確定要以 Helvetica 輸出請加 --allow-font-fallback") from _e
+        print("PDF font setup error, falling back to Helvetica:", _e)
+        _PDF_FONT = "Helvetica"
+        return _PDF_FONT
+    _rc["font.family"] = [name]
+    _rc["font.sans-serif"] = [name]
+    _rc["axes.unicode_minus"] = False
+    _PDF_FONT = "NotoSansTC"
+    return _PDF_FONT
+
+
+# ===============================
+# 2. 版面元件
+# ===============================
+def _styles(font: str) -> Dict[str, ParagraphStyle]:
+    base = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("title", parent=base["Title"], fontName=font),
+        "h2": ParagraphStyle("h2", parent=base["Heading2"], fontName=font),
+        "body": ParagraphStyle("body", parent=base["BodyText"], fontName=font),
+    }
+
+
+def _df_table(df, font: str, formats: Optional[Dict[str, str]] = None) -> Table:
+    """DataFrame 轉 reportlab Table；formats 為各欄格式字串（例如 "{:,.0f}"）"""
+    formats = formats or {}
+    rows = [list(df.columns)]
+    for rec in df.itertuples(index=False):
+        rows.append([formats[c].format(v) if c in formats else str(v) for c, v in zip(df.columns, rec)])
+    t = Table(rows, hAlign="LEFT")
+    t.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), font),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eeeeee")),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+    ]))
+    return t
+
+
+def _bar_chart(labels: List[str], values: List[float], title: str, ylabel: str, width_mm: float = 160) -> Image:
+    """matplotlib 長條圖 → PNG（記憶體內），圖表用完即關閉"""
+    fig, ax = plt.subplots(figsize=(6.4, 3.2), dpi=120)
+    try:
+        bars = ax.bar(labels, values, color="#4c78a8")
+        for b, v in zip(bars, values):
+            ax.annotate(f"{v:,.0f}", (b.get_x() + b.get_width() / 2, b.get_height()),
+                        ha="center", va="bottom", fontsize=8)
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        ax.tick_params(axis="x", labelsize=8)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+    finally:
+        plt.close(fig)
+    buf.seek(0)
+    w = width_mm * mm
+    return Image(buf, width=w, height=w / 2)
+
+
+# ===============================
+# 3. 單一客戶報告
+# ===============================
+_estate = None
+
+
+def _estate_components():
+    """遺產稅計算器／模擬器（每個程序建立一次）"""
+    global _estate
+    if _estate is None:
+        import estate_tax_app
+        calc = estate_tax_app.EstateTaxCalculator(estate_tax_app.TaxConstants())
+        _estate = (calc, estate_tax_app.EstateTaxSimulator(calc))
+    return _estate
+
+
+def build_report_story(client: Dict[str, Any], font: str) -> list:
+    """組出一位客戶的報告內容（platypus flowables）"""
+    sty = _styles(font)
+    story = [Paragraph(f"《影響力》傳承策略報告｜{client.get('name', client.get('client_id', ''))}", sty["title"])]
+
+    if client.get("dividend"):
+        r = compute_single_year(**client["dividend"])
+        story += [Paragraph("模組一｜單年度稅負試算（元）", sty["h2"]),
+                  Paragraph("公司層", sty["body"]),
+                  _df_table(company_table(r), font, {"金額": "{:,.0f}"}),
+                  Spacer(1, 4 * mm),
+                  Paragraph("股東層", sty["body"]),
+                  _df_table(shareholder_table(r), font, {"金額": "{:,.0f}"}),
+                  Spacer(1, 4 * mm),
+                  Paragraph("總結", sty["body"]),
+                  _df_table(total_table(r), font, {"公司層合計稅": "{:,.0f}", "股東層稅": "{:,.0f}",
+                                                  "本年總稅負": "{:,.0f}", "有效稅率(總稅/稅前盈餘)": "{:.2%}"}),
+                  Spacer(1, 4 * mm),
+                  _bar_chart(["公司稅", "未分配盈餘稅", "股東層稅"], [r["corp_tax"], r["undist_tax"], r["sh_tax"]],
+                             "稅負結構", "金額（元）")]
+
+    if client.get("estate"):
+        calc, sim = _estate_components()
+        e = dict(client["estate"])
+        family = (e["total_assets"], e.get("spouse", False), e.get("adult_children", 0),
+                  e.get("other_dependents", 0), e.get("disabled_people", 0), e.get("parents", 0))
+        _, tax_due, _ = calc.calculate_estate_tax(*family)
+        # 與頁面相同的限制；不合法時丟出 ValueError，該客戶列入失敗清單、不產出 PDF
+        premium, claim, gift = sim.resolve_case_inputs(
+            e["total_assets"], tax_due, e.get("premium"), e.get("claim"), e.get("gift")
+        )
+        df_case_results = sim.simulate_case_plans(*family, premium, claim, gift)
+        story += [Spacer(1, 6 * mm),
+                  Paragraph("模組三｜遺產稅規劃策略比較（萬）", sty["h2"]),
+                  Paragraph(f"總資產：{int(e['total_assets']):,d} 萬｜預估遺產稅：{tax_due:,.0f} 萬", sty["body"]),
+                  Spacer(1, 2 * mm),
+                  _df_table(df_case_results, font, {"遺產稅（萬）": "{:,d}", "家人總共取得（萬）": "{:,d}",
+                                                     "規劃效益": "{:+,d}"}),
+                  Spacer(1, 4 * mm),
+                  _bar_chart(list(df_case_results["規劃策略"]), list(df_case_results["家人總共取得（萬）"]),
+                             "不同規劃策略下家人總共取得金額比較", "家人總共取得（萬）")]
+    return story
+
+
+def render_client_report(client: Dict[str, Any], out_path: str, allow_font_fallback: bool = False) -> str:
+    """產出單一客戶 PDF，直接寫檔（不回傳 bytes，避免大量報告佔用主程序記憶體）"""
+    font = setup_fonts(allow_font_fallback)
+    doc = SimpleDocTemplate(out_path, pagesize=A4, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=15 * mm, bottomMargin=15 * mm)
+    doc.build(build_report_story(client, font))
+    return out_path
+
+
+# ===============================
+# 4. 批次產出（程序池）
+# ===============================
+def report_filename(client: Dict[str, Any]) -> str:
+    """由 client_id（或 name）產生檔名；只保留文字、數字、-、_，避免路徑跳脫"""
+    cid = client.get("client_id") or client.get("name")
+    if cid is None or not str(cid).strip():
+        raise ValueError("client_id／name 皆未提供")
+    stem = re.sub(r"[^\w\-]+", "_", str(cid).strip()).strip("_")
+    if not stem:
+        raise ValueError(f"client_id 無法轉為檔名：{cid!r}")
+    return f"{stem}.pdf"
+
+
+def _worker(client: Dict[str, Any], out_path: str, allow_font_fallback: bool) -> str:
+    return render_client_report(client, out_path, allow_font_fallback)
+
+
+def generate_reports(clients: List[Dict[str, Any]], out_dir: str, workers: Optional[int] = None,
+                     max_pending: Optional[int] = None, tasks_per_child: int = 50,
+                     allow_font_fallback: bool = False) -> Dict[str, Any]:
+    """以程序池平行產出報告
+
+    - 送出前先檢查字型與檔名：缺字型、缺 client_id 或檔名重複時整批不產出（ValueError／RuntimeError）
+    - 同時在途的工作數以 max_pending 為上限（預設 workers×2），客戶清單不會一次全數送進佇列
+    - 每個 worker 處理 tasks_per_child 份後重啟，釋放 matplotlib／計算快取累積的記憶體
+    """
+    setup_fonts(allow_font_fallback)
+    names, problems = [], []
+    seen: Dict[str, int] = {}
+    for i, client in enumerate(clients):
+        try:
+            name = report_filename(client)
+        except ValueError as e:
+            problems.append(f"第 {i + 1} 筆：{e}")
+            continue
+        if name in seen:
+            problems.append(f"第 {i + 1} 筆：檔名 {name} 與第 {seen[name] + 1} 筆重複")
+        seen.setdefault(name, i)
+        names.append(name)
+    if problems:
+        raise ValueError("客戶清單有誤：\n" + "\n".join(problems))
+
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    done_paths, errors = [], {}
+    pending = {}
+    it = iter(zip(clients, names))
+    with ProcessPoolExecutor(max_workers=workers, initializer=setup_fonts, initargs=(allow_font_fallback,),
+                             max_tasks_per_child=tasks_per_child) as pool:
+        while True:
+            while len(pending) < max_pending:
+                job = next(it, None)
+                if job is None:
+                    break
+                client, name = job
+                fut = pool.submit(_worker, client, os.path.join(out_dir, name), allow_font_fallback)
+                pending[fut] = name
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = pending.pop(fut)
+                try:
+                    done_paths.append(fut.result())
+                except Exception as e:
+                    errors[name] = repr(e)
+    return {"done": done_paths, "errors": errors}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="批次產出客戶 PDF 報告")
+    ap.add_argument("clients", help="客戶清單 JSON 檔")
+    ap.add_argument("out_dir", help="輸出資料夾")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--max-pending", type=int, default=None)
+    ap.add_argument("--allow-font-fallback", action="store_true", help="找不到中文字型時改用 Helvetica（中文會空白）")
+    args = ap.parse_args()
+    with open(args.clients, encoding="utf-8") as f:
+        clients = json.load(f)
+    try:
+        res = generate_reports(clients, args.out_dir, args.workers, args.max_pending,
+                               allow_font_fallback=args.allow_font_fallback)
+    except (ValueError, RuntimeError) as e:
+        raise SystemExit(f"未產出任何報告：{e}")
+    print(f"完成 {len(res['done'])} 份，失敗 {len(res['errors'])} 份")
+    for cid, err in res["errors"].items():
+        print(f"  {cid}: {err}")
@@ -0,0 +1,115 @@
+"""公司 → 遺產整合試算（模組一 × 模組三）
+
+每年以模組一的單年度試算得到創辦人實領現金股利與公司保留的權益，逐年累積進創辦人遺產；
+再套用模組三的提前贈與、保險策略，於各年度（身故時點）計算遺產稅與家人總共取得。
+所有分配政策 × 贈與額 × 保費 × 年度一次向量化計算，可取各年度最佳組合或比較各分配政策。
+
+模型假設（解讀結果時請留意）：
+- 公司保留盈餘以帳面值計入遺產，未分配前不課股東層稅，因此低現金股利的政策通常看起來較有利
+- 理賠金 = 保費 × claim_ratio，於任何身故年度都全額給付；claim_ratio > 1 時保費越高結果越好，
+  保費應視為使用者選定的條件，不宜交由最佳化搜尋
+
+金額單位：公司參數為元（同模組一），遺產相關為萬（同模組三）。
+"""
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from dividend_tax import compute_single_year_batch
+
+WAN = 10_000  # 元 → 萬
+
+
+def run_pipeline(company: Dict[str, Any], family: Dict[str, Any], initial_estate: float,
+                 cash_pcts: Iterable[float], stock_pcts: Iterable[float] = (0.0,), years: int = 20,
+                 annual_gifts: Iterable[float] = (0, 244), premiums: Iterable[float] = (0,),
+                 claim_ratio: float = 1.5, pretax_growth: float = 0.0, ownership: float = 1.0,
+                 liquid_assets: Optional[float] = None, simulator=None) -> pd.DataFrame:
+    """計算所有 (現金股利%, 股票股利%, 每年贈與, 保費, 年度) 組合的遺產結果
+
+    - company：compute_single_year 的參數（不含 cash_pct／stock_pct），pretax 為第 1 年稅前盈餘
+    - family：total_assets 以外的 calculate_estate_tax 參數（spouse、adult_children…）
+    - initial_estate：目前個人遺產（萬，不含公司股權增值）
+    - liquid_assets：可動用的個人資產（萬），省略時視為 initial_estate 全數可動用
+    - 保費於第 0 年自可動用資產支付，理賠金 = 保費 × claim_ratio；保費高於 liquid_assets 的組合不列入
+    - 每年贈與以可動用資產（liquid_assets＋累計實領淨額－保費－已贈與）為上限
+    - 同頁面限制，保費＋累計贈與超過當年遺產總額的組合不列入
+    """
+    if simulator is None:
+        import estate_tax_app
+        simulator = estate_tax_app.EstateTaxSimulator(estate_tax_app.EstateTaxCalculator(estate_tax_app.TaxConstants()))
+
+    cash_pcts = np.asarray(list(cash_pcts), dtype=float)
+    stock_pcts = np.asarray(list(stock_pcts), dtype=float)
+    annual_gifts = np.asarray(list(annual_gifts), dtype=float)
+    premiums = np.asarray(list(premiums), dtype=float)
+
+    # 分配政策（現金 + 股票 ≤ 100%）
+    cp, sp = np.meshgrid(cash_pcts, stock_pcts, indexing="ij")
+    ok = cp + sp <= 1.0 + 1e-9
+    cp, sp = cp[ok], sp[ok]
+    n_pol = cp.size
+    t = np.arange(1, years + 1)
+
+    # 1) 公司層／股東層：政策 × 年度，一次算完
+    params = dict(company)
+    pretax = float(params.pop("pretax")) * (1 + pretax_growth) ** (t - 1)
+    r = compute_single_year_batch(pretax=pretax[None, :], cash_pct=cp[:, None], stock_pct=sp[:, None], **params)
+    net_cash = (r["cash"] - r["sh_tax"]) * ownership / WAN                       # 創辦人實領（萬）
+    equity = (r["after_tax"] - r["cash"] - r["undist_tax"]) * ownership / WAN    # 留在公司的權益（萬）
+    gross_estate = initial_estate + np.cumsum(net_cash + equity, axis=1)         # (政策, 年度)，未扣贈與／保費
+
+    # 2) 贈與：每年至多 annual_gift，且不超過扣除保費後的可動用資產；依年度遞推（政策 × 贈與額 × 保費 向量化）
+    if liquid_assets is None:
+        liquid_assets = initial_estate
+    available = liquid_assets + np.cumsum(net_cash, axis=1)                      # (政策, 年度)
+    room = available[:, None, :] - premiums[None, :, None]                       # (政策, 保費, 年度)
+    shape = (n_pol, annual_gifts.size, premiums.size, years)
+    gifted = np.zeros(shape)
+    given = np.zeros(shape[:3])
+    for y in range(years):
+        target = np.minimum(given + annual_gifts[None, :, None], room[:, None, :, y])
+        given = np.maximum(given, target)
+        gifted[..., y] = given
+
+    # 3) 展開成 政策 × 贈與 × 保費 × 年度，只保留付得起的組合，交給模組三的向量化策略試算
+    g_estate = np.broadcast_to(gross_estate[:, None, None, :], shape)
+    g_prem = np.broadcast_to(premiums[None, None, :, None], shape)
+    feasible = ((g_prem <= liquid_assets) & (g_prem + gifted <= g_estate)).ravel()
+    g_estate, g_prem, g_gift = g_estate.ravel()[feasible], g_prem.ravel()[feasible], gifted.ravel()[feasible]
+    tax, net = simulator.simulate_case_plans_batch(
+        g_estate, family.get("spouse", False), family.get("adult_children", 0),
+        family.get("other_dependents", 0), family.get("disabled_people", 0), family.get("parents", 0),
+        g_prem, g_prem * claim_ratio, g_gift
+    )
+
+    idx = np.indices(shape).reshape(4, -1)[:, feasible]
+    df = pd.DataFrame({
+        "現金股利%": cp[idx[0]],
+        "股票股利%": sp[idx[0]],
+        "每年贈與上限（萬）": annual_gifts[idx[1]],
+        "保費（萬）": premiums[idx[2]],
+        "年度": t[idx[3]],
+        "累計贈與（萬）": g_gift,
+        "遺產總額（萬）": g_estate,
+        "累計稅負（萬）": (np.cumsum(r["total_all"] * ownership / WAN, axis=1)[idx[0], idx[3]]),
+        "遺產稅（萬）": tax[:, 3],
+        "家人總共取得（萬）": net[:, 3],
+        "沒有規劃_家人總共取得（萬）": net[:, 0],
+    })
+    df["規劃效益"] = df["家人總共取得（萬）"] - df["沒有規劃_家人總共取得（萬）"]
+    return df
+
+
+def best_by_horizon(df: pd.DataFrame, objective: str = "家人總共取得（萬）") -> pd.DataFrame:
+    """各年度（身故時點）家人總共取得最多的組合"""
+    best = df.loc[df.groupby("年度")[objective].idxmax()]
+    return best.reset_index(drop=True)
+
+
+def best_by_policy(df: pd.DataFrame, year: int, objective: str = "家人總共取得（萬）") -> pd.DataFrame:
+    """指定身故年度下，每個 (保費, 分配政策) 取最佳贈與額，依 objective 由高到低排列"""
+    at = df[df["年度"] == year]
+    best = at.loc[at.groupby(["保費（萬）", "現金股利%", "股票股利%"])[objective].idxmax()]
+    return best.sort_values(objective, ascending=False, kind="stable").reset_index(drop=True)
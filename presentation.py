@@ -0,0 +1,75 @@
+"""表格呈現層
+
+表格保留數值型別（可排序、匯出不失真），千分位／百分比只在顯示時透過 column_config 套用；
+建表結果以輸入為鍵快取，輸入未變的重跑不再重建 DataFrame。
+"""
+from typing import Dict, Iterable, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from dividend_tax import compute_single_year, company_table, shareholder_table, total_table
+
+
+# ===============================
+# 1. 欄位格式
+# ===============================
+def money_column(label: str = None):
+    """金額：整數、千分位"""
+    return st.column_config.NumberColumn(label, format="localized")
+
+
+def percent_column(label: str = None):
+    """比率：百分比（最多兩位小數）"""
+    return st.column_config.NumberColumn(label, format="percent")
+
+
+def show_table(df: pd.DataFrame, money: Iterable[str] = (), percent: Iterable[str] = (), **kwargs):
+    """以 st.dataframe 顯示數值表格，指定欄位於前端格式化；money 欄若為浮點數先四捨五入為整數"""
+    money = list(money)
+    floats = [c for c in money if pd.api.types.is_float_dtype(df[c])]
+    if floats:
+        df = _round_money(df.copy(), floats)
+    config = {c: money_column() for c in money}
+    config.update({c: percent_column() for c in percent})
+    kwargs.setdefault("width", "stretch")
+    kwargs.setdefault("hide_index", True)
+    st.dataframe(df, column_config=config, **kwargs)
+
+
+def _round_money(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    for c in columns:
+        df[c] = df[c].round(0).astype("int64")
+    return df
+
+
+# ===============================
+# 2. 模組一（單年度稅負）
+# ===============================
+@st.cache_data(show_spinner=False, max_entries=256)
+def dividend_view(**inputs) -> Tuple[Dict[str, float], pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """試算結果與公司層／股東層／總結三張表；參數同 compute_single_year"""
+    r = compute_single_year(**inputs)
+    df_company = _round_money(company_table(r), ["金額"])
+    df_sh = _round_money(shareholder_table(r), ["金額"])
+    df_total = _round_money(total_table(r), ["公司層合計稅", "股東層稅", "本年總稅負"])
+    return r, df_company, df_sh, df_total
+
+
+# ===============================
+# 3. 模組三（遺產稅概況）
+# ===============================
+@st.cache_data(show_spinner=False, max_entries=256)
+def estate_summary_view(total_assets: float, deduction_items: Tuple[Tuple[str, float], ...],
+                        taxable_amount: float, tax_due: float) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """資產概況、扣除項目、稅務計算三張表（金額（萬），整數型別）"""
+    df_assets = pd.DataFrame({"項目": ["總資產"], "金額（萬）": pd.Series([total_assets]).astype("int64")})
+    df_deductions = pd.DataFrame({
+        "項目": [label for label, _ in deduction_items],
+        "金額（萬）": pd.Series([amount for _, amount in deduction_items]).astype("int64"),
+    })
+    df_tax = pd.DataFrame({
+        "項目": ["課稅遺產淨額", "預估遺產稅"],
+        "金額（萬）": pd.Series([taxable_amount, tax_due]).astype("int64"),
+    })
+    return df_assets, df_deductions, df_tax
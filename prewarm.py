@@ -0,0 +1,203 @@
+"""啟動預熱
+
+每個程序首次執行時，於背景把常用輸入組合跑過計算器與圖表：
+- 遺產稅額（calculate_estate_tax）與模組一建表結果（presentation.dividend_view）會寫入 st.cache_data
+- 策略模擬與圖表沒有快取，只預先載入 pandas／plotly 延遲載入的模組，縮短第一位使用者的等待
+"""
+import inspect
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dividend_tax import build_company_tax_figure, build_shareholder_tax_figure, compute_single_year
+from presentation import dividend_view
+
+
+# ===============================
+# 1. 預設常用輸入組合
+# ===============================
+# 與頁面預設值一致：遺產稅單位為萬、股利試算單位為元
+DEFAULT_ESTATE_PROFILES: List[Dict[str, Any]] = [
+    {"total_assets": 5000, "spouse": False, "adult_children": 0, "other_dependents": 0, "disabled_people": 0, "parents": 0},
+    {"total_assets": 5000, "spouse": True, "adult_children": 0, "other_dependents": 0, "disabled_people": 0, "parents": 0},
+    {"total_assets": 5000, "spouse": True, "adult_children": 2, "other_dependents": 0, "disabled_people": 0, "parents": 0},
+    {"total_assets": 10000, "spouse": True, "adult_children": 2, "other_dependents": 0, "disabled_people": 0, "parents": 0},
+    {"total_assets": 30000, "spouse": True, "adult_children": 2, "other_dependents": 0, "disabled_people": 0, "parents": 0},
+]
+
+DEFAULT_DIVIDEND_PROFILES: List[Dict[str, Any]] = [
+    {"pretax": 20_000_000, "init_capital": 1_000_000, "corp_tax_rate": 0.20, "corp_amt_min": 0.12,
+     "legal_on": True, "lr_rate": 0.10, "lr_cap": 0.25, "undist_rate": 0.05,
+     "cash_pct": 0.0, "stock_pct": 0.0, "shareholder_kind": "individual_resident",
+     "indiv_mode": "split28", "other_income": 0, "withhold": 0.0},
+]
+
+
+# ===============================
+# 2. 使用統計（記錄實際輸入組合）
+# ===============================
+_usage_lock = threading.Lock()
+
+USAGE_MAX_BYTES = 1_000_000   # 明細檔超過此大小即併入計數檔並清空
+USAGE_MAX_PROFILES = 500      # 計數檔每種類別最多保留的輸入組合數
+
+
+def _counts_path(path: str) -> str:
+    return path + ".counts.json"
+
+
+def _read_usage_log(path: str) -> Dict[str, Counter]:
+    """讀取明細檔（JSON Lines），回傳各類別的輸入組合計數"""
+    counts: Dict[str, Counter] = {}
+    p = Path(path)
+    if not p.exists():
+        return counts
+    with p.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            key = json.dumps(rec.get("profile", {}), ensure_ascii=False, sort_keys=True)
+            counts.setdefault(rec.get("kind"), Counter())[key] += 1
+    return counts
+
+
+def _read_usage_counts(path: str) -> Dict[str, Counter]:
+    """讀取計數檔（{類別: {輸入組合 JSON: 次數}}）"""
+    try:
+        with open(_counts_path(path), encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {kind: Counter(c) for kind, c in raw.items()}
+
+
+def compact_usage(path: str, max_profiles: int = USAGE_MAX_PROFILES) -> None:
+    """將明細檔併入計數檔（每類別只留最常用的 max_profiles 組）後移除明細檔"""
+    rotated = f"{path}.{os.getpid()}.compacting"
+    try:
+        os.replace(path, rotated)  # 先改名，其他程序之後的寫入會落在新的明細檔
+    except FileNotFoundError:
+        return
+    counts = _read_usage_counts(path)
+    for kind, c in _read_usage_log(rotated).items():
+        counts.setdefault(kind, Counter()).update(c)
+    trimmed = {kind: dict(c.most_common(max_profiles)) for kind, c in counts.items()}
+    tmp = _counts_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(trimmed, f, ensure_ascii=False)
+    os.replace(tmp, _counts_path(path))
+    os.remove(rotated)
+
+
+def record_usage(path: str, kind: str, profile: Dict[str, Any], max_bytes: int = USAGE_MAX_BYTES) -> None:
+    """將一次輸入組合附加到使用統計明細檔（JSON Lines）；超過 max_bytes 時併入計數檔"""
+    line = json.dumps({"kind": kind, "profile": profile}, ensure_ascii=False, sort_keys=True)
+    with _usage_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            size = f.tell()
+        if size > max_bytes:
+            compact_usage(path)
+
+
+def load_usage_profiles(path: str, kind: str, top_n: int) -> List[Dict[str, Any]]:
+    """讀取使用統計（計數檔＋尚未併入的明細），回傳最常出現的前 top_n 組輸入"""
+    counts = _read_usage_counts(path).get(kind, Counter())
+    counts.update(_read_usage_log(path).get(kind, Counter()))
+    return [json.loads(k) for k, _ in counts.most_common(top_n)]
+
+
+def resolve_profiles(config: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """依設定決定預熱清單：設定檔清單 > 使用統計 > 內建預設"""
+    config = dict(config or {})
+    usage_log = config.get("usage_log")
+    top_n = int(config.get("top_n", 10))
+    profiles = {}
+    for kind, defaults in (("estate", DEFAULT_ESTATE_PROFILES), ("dividend", DEFAULT_DIVIDEND_PROFILES)):
+        listed = [dict(p) for p in config.get(f"{kind}_profiles", [])]
+        recorded = load_usage_profiles(usage_log, kind, top_n) if usage_log else []
+        profiles[kind] = listed or recorded or defaults
+    return profiles
+
+
+# ===============================
+# 3. 預熱執行
+# ===============================
+def _page_order(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """依 compute_single_year 參數順序排列並補上預設值
+
+    st.cache_data 依傳入順序雜湊 kwargs；頁面以參數順序傳入全部 14 個欄位，
+    使用統計（sort_keys）或 Secrets 清單的鍵順序不同時，預熱結果不會被頁面命中。
+    """
+    ordered = {}
+    for name, param in inspect.signature(compute_single_year).parameters.items():
+        if name == "brackets":
+            continue
+        if name in profile:
+            ordered[name] = profile[name]
+        elif param.default is not inspect.Parameter.empty:
+            ordered[name] = param.default
+    return ordered
+
+
+def run_prewarm(estate_mod, profiles: Dict[str, List[Dict[str, Any]]]) -> Dict[str, float]:
+    """將各輸入組合跑過計算器與建表，填滿快取；回傳各階段耗時（秒）
+
+    圖表不經快取，建圖只為預先載入 plotly 的延遲載入模組（驗證器、範本），結果隨即丟棄。
+    """
+    timings = {}
+    calc = estate_mod.EstateTaxCalculator(estate_mod.TaxConstants())
+    sim = estate_mod.EstateTaxSimulator(calc)
+
+    t0 = time.perf_counter()
+    for p in profiles.get("estate", []):
+        _, tax_due, _ = calc.calculate_estate_tax(
+            p["total_assets"], p["spouse"], p["adult_children"],
+            p["other_dependents"], p["disabled_people"], p["parents"]
+        )
+        premium, claim, gift = sim.default_case_inputs(p["total_assets"], tax_due)
+        df_case_results = sim.simulate_case_plans(
+            p["total_assets"], p["spouse"], p["adult_children"],
+            p["other_dependents"], p["disabled_people"], p["parents"],
+            premium, claim, gift
+        )
+        estate_mod.build_case_figure(df_case_results).to_json()
+    timings["estate"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for p in profiles.get("dividend", []):
+        r, _, _, _ = dividend_view(**_page_order(p))
+        build_company_tax_figure(r).to_json()
+        build_shareholder_tax_figure(r).to_json()
+    timings["dividend"] = time.perf_counter() - t0
+    return timings
+
+
+def start_prewarm(estate_mod, config: Optional[Dict[str, Any]] = None) -> Optional[threading.Thread]:
+    """於背景執行緒啟動預熱；設定 enabled = false 時不啟動"""
+    config = dict(config or {})
+    if not config.get("enabled", True):
+        return None
+    profiles = resolve_profiles(config)
+
+    def _run():
+        try:
+            timings = run_prewarm(estate_mod, profiles)
+            print("Prewarm done:", {k: round(v, 3) for k, v in timings.items()})
+        except Exception as _e:
+            print("Prewarm error:", _e)
+
+    t = threading.Thread(target=_run, name="prewarm", daemon=True)
+    t.start()
+    return t
+
+
+if __name__ == "__main__":
+    import estate_tax_app
+    print(run_prewarm(estate_tax_app, resolve_profiles()))
@@ -0,0 +1,243 @@
+"""方案儲存庫（Arrow IPC 欄式格式）
+
+- 每次儲存寫成一個小 segment 檔（不改寫既有檔案，附加成本低）
+- 讀取以 memory map 開啟，未壓縮的 Arrow 欄位可零複製使用
+- segment 數量過多時自動合併（compact）；另可匯出 Parquet 供外部分析
+- 多個程序（實例）可共用同一資料夾：寫入以檔案鎖互斥，合併以世代資料夾切換，讀取端不需加鎖
+"""
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows：僅有程序內鎖，請勿讓多個實例共用同一資料夾
+    fcntl = None
+
+
+# ===============================
+# 1. 欄位定義
+# ===============================
+# 規劃策略（順序同 estate_tax_app.CASE_STRATEGIES）→ 欄位前綴
+STRATEGY_KEYS = ["no_plan", "gift", "insurance", "combo", "combo_taxed"]
+
+SCHEMA = pa.schema(
+    [
+        ("scenario_id", pa.string()),
+        ("saved_at", pa.timestamp("us", tz="UTC")),
+        ("client", pa.string()),
+        ("advisor", pa.string()),
+        ("total_assets", pa.float64()),
+        ("spouse", pa.bool_()),
+        ("adult_children", pa.int32()),
+        ("parents", pa.int32()),
+        ("disabled_people", pa.int32()),
+        ("other_dependents", pa.int32()),
+        ("premium", pa.float64()),
+        ("claim", pa.float64()),
+        ("gift", pa.float64()),
+    ]
+    + [(f"{k}_{m}", pa.int64()) for k in STRATEGY_KEYS for m in ("tax", "net", "benefit")]
+)
+
+
+def scenario_record(client: str, advisor: str, total_assets: float, spouse: bool, adult_children: int,
+                    parents: int, disabled_people: int, other_dependents: int,
+                    premium: float, claim: float, gift: float, df_case_results) -> Dict[str, Any]:
+    """由案例模擬結果（df_case_results）組成一筆可儲存的方案"""
+    rec = {
+        "scenario_id": uuid.uuid4().hex,
+        "saved_at": datetime.now(timezone.utc),
+        "client": client,
+        "advisor": advisor,
+        "total_assets": total_assets,
+        "spouse": bool(spouse),
+        "adult_children": adult_children,
+        "parents": parents,
+        "disabled_people": disabled_people,
+        "other_dependents": other_dependents,
+        "premium": premium,
+        "claim": claim,
+        "gift": gift,
+    }
+    for key, (_, row) in zip(STRATEGY_KEYS, df_case_results.iterrows()):
+        rec[f"{key}_tax"] = int(row["遺產稅（萬）"])
+        rec[f"{key}_net"] = int(row["家人總共取得（萬）"])
+        rec[f"{key}_benefit"] = int(row["規劃效益"])
+    return rec
+
+
+# ===============================
+# 2. 儲存庫
+# ===============================
+class ScenarioStore:
+    """以資料夾內多個 Arrow IPC segment 組成的方案表
+
+    目錄結構：CURRENT 記錄目前世代（gen-000001…），segment 都放在該世代資料夾內。
+    - 附加：在目前世代寫入新 segment（先寫 .tmp 再改名）
+    - 合併：把目前世代合併成一個 segment 寫入下一世代，再以 os.replace 切換 CURRENT；
+      舊世代保留 KEEP_GENERATIONS 代才刪除，讀取端永遠只讀單一世代，不會同時看到合併前後的資料
+    - 附加／合併以 threading.Lock＋.lock 檔（fcntl.flock）互斥，跨程序也成立
+    """
+
+    SEGMENT_SUFFIX = ".arrow"
+    KEEP_GENERATIONS = 2
+    READ_RETRIES = 5
+
+    def __init__(self, root: str, compact_threshold: int = 64):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._cache_key = None
+        self._cache_table: Optional[pa.Table] = None
+        with self._write_lock():
+            if not (self.root / "CURRENT").exists():
+                self._init_layout()
+
+    # ---- 世代與鎖 ----
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.root / ".lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _init_layout(self) -> None:
+        gen = self.root / "gen-000000"
+        gen.mkdir(exist_ok=True)
+        for p in self.root.glob(f"*{self.SEGMENT_SUFFIX}"):  # 舊版直接放在根目錄的 segment
+            os.replace(p, gen / p.name)
+        self._set_current(gen.name)
+
+    def _current(self) -> Path:
+        return self.root / (self.root / "CURRENT").read_text(encoding="utf-8").strip()
+
+    def _set_current(self, name: str) -> None:
+        tmp = self.root / "CURRENT.tmp"
+        tmp.write_text(name, encoding="utf-8")
+        os.replace(tmp, self.root / "CURRENT")
+
+    @staticmethod
+    def _gen_index(gen: Path) -> int:
+        return int(gen.name.split("-")[1])
+
+    def _segments(self, gen: Path) -> List[Path]:
+        return sorted(gen.glob(f"*{self.SEGMENT_SUFFIX}"))
+
+    @staticmethod
+    def _read_segments(segments: List[Path]) -> List[pa.Table]:
+        tables = []
+        for p in segments:
+            with pa.memory_map(str(p), "r") as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+        return tables
+
+    def _write_segment(self, gen: Path, table: pa.Table) -> Path:
+        name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}{self.SEGMENT_SUFFIX}"
+        final = gen / name
+        tmp = gen / (name + ".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, final)  # 寫完才出現在 glob 中，讀取端不會看到半個檔案
+        return final
+
+    # ---- 讀寫 ----
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """附加方案（一次寫一個 segment）；回傳筆數"""
+        if not records:
+            return 0
+        table = pa.Table.from_pylist(records, schema=SCHEMA)
+        with self._write_lock():
+            gen = self._current()
+            self._write_segment(gen, table)
+            if len(self._segments(gen)) > self.compact_threshold:
+                self._compact_locked()
+        return table.num_rows
+
+    def table(self) -> pa.Table:
+        """以 memory map 讀取目前世代的全部方案；segment 未變動時沿用上次結果"""
+        for _ in range(self.READ_RETRIES):
+            try:
+                table = self._read_generation()
+            except FileNotFoundError:
+                table = None
+            if table is not None:
+                return table
+        raise RuntimeError(f"方案儲存庫持續變動，{self.READ_RETRIES} 次讀取皆未完成：{self.root}")
+
+    def _read_generation(self) -> Optional[pa.Table]:
+        """讀取一個世代；讀取期間該世代可能已被刪除時回傳 None（由呼叫端重試）"""
+        gen = self._current()
+        segments = self._segments(gen)
+        key = (gen.name, tuple((p.name, p.stat().st_size) for p in segments))
+        if key == self._cache_key and self._cache_table is not None:
+            return self._cache_table
+        tables = self._read_segments(segments)
+        # 世代 k 只會在 CURRENT 前進到 k + KEEP_GENERATIONS 之後才被刪除；
+        # 讀完時 CURRENT 尚未前進那麼多，代表讀取期間沒有檔案被刪，結果完整
+        if self._gen_index(self._current()) - self._gen_index(gen) >= self.KEEP_GENERATIONS:
+            return None
+        table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+        self._cache_key, self._cache_table = key, table
+        return table
+
+    def query(self, filter: Optional[pc.Expression] = None, columns: Optional[List[str]] = None) -> pa.Table:
+        """篩選方案，例如 query(pc.field("combo_benefit") > 500)"""
+        table = self.table()
+        if filter is not None:
+            table = table.filter(filter)
+        if columns:
+            table = table.select(columns)
+        return table
+
+    def latest_by_client(self, filter: Optional[pc.Expression] = None) -> pa.Table:
+        """每位客戶只取最後儲存的一筆方案，再套用篩選"""
+        table = self.table()
+        if table.num_rows:
+            last = table.group_by("client").aggregate([("saved_at", "max")])
+            table = table.join(last, keys=["client", "saved_at"], right_keys=["client", "saved_at_max"],
+                               join_type="inner")
+        if filter is not None:
+            table = table.filter(filter)
+        return table
+
+    def compact(self) -> int:
+        """把目前世代的所有 segment 合併為一個；回傳合併前 segment 數"""
+        with self._write_lock():
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        gen = self._current()
+        segments = self._segments(gen)
+        if len(segments) <= 1:
+            return len(segments)
+        merged = pa.concat_tables(self._read_segments(segments)).combine_chunks()
+        new_gen = self.root / f"gen-{self._gen_index(gen) + 1:06d}"
+        shutil.rmtree(new_gen, ignore_errors=True)  # 上次合併中斷留下的半成品
+        new_gen.mkdir()
+        self._write_segment(new_gen, merged)
+        self._set_current(new_gen.name)
+        for old in sorted(self.root.glob("gen-*"), key=self._gen_index)[:-self.KEEP_GENERATIONS]:
+            shutil.rmtree(old, ignore_errors=True)
+        return len(segments)
+
+    def export_parquet(self, path: str) -> None:
+        """匯出為單一 Parquet 檔"""
+        pq.write_table(self.table(), path)